@@ -1,187 +1,156 @@
 """The Computer integration."""
 import logging
 import asyncio
+import time
+import voluptuous as vol
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.helpers.entity_component import EntityComponent
 from homeassistant.loader import async_get_integration
-from .const import DOMAIN
+from .const import (
+	DOMAIN,
+	CONF_REFRESH_JITTER, CONF_REFRESH_MAX_IN_FLIGHT, CONF_REFRESH_TIMEOUT, CONF_STALE_AFTER,
+	REFRESH_JITTER, REFRESH_MAX_IN_FLIGHT, REFRESH_REPLY_TIMEOUT, REFRESH_STALE_AFTER
+)
+from .entity_index import ROLE_MAIN, async_lookup_entity, async_remove_entry_index
+from .metrics import service_call_started
+from .refresh import async_get_refresh_scheduler
 
 _LOGGER = logging.getLogger(__name__)
 
-# Use the computer platform (not media_player)
-PLATFORMS = ["computer"] 
+# Platforms of the sub-entities; the main entity lives in the integration's
+# own "computer" entity component
+PLATFORMS = ["button", "number", "sensor", "switch"]
+
+# Devices are set up through the UI; configuration.yaml only holds settings
+# shared by all computers. A bare "computer:" key (None) uses the defaults.
+CONFIG_SCHEMA = vol.Schema(
+	{
+		vol.Optional(DOMAIN): vol.All(lambda value: value or {}, vol.Schema({
+			vol.Optional(CONF_REFRESH_JITTER, default=REFRESH_JITTER):
+				vol.All(vol.Coerce(float), vol.Range(min=0, max=300)),
+			vol.Optional(CONF_REFRESH_MAX_IN_FLIGHT, default=REFRESH_MAX_IN_FLIGHT):
+				vol.All(vol.Coerce(int), vol.Range(min=1, max=1000)),
+			vol.Optional(CONF_REFRESH_TIMEOUT, default=REFRESH_REPLY_TIMEOUT):
+				vol.All(vol.Coerce(float), vol.Range(min=1, max=300)),
+			vol.Optional(CONF_STALE_AFTER, default=REFRESH_STALE_AFTER):
+				vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+		}))
+	},
+	extra=vol.ALLOW_EXTRA,
+)
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
 	"""Set up the Computer component."""
 	hass.data.setdefault(DOMAIN, {})
+	# One entity component holds the main entity of every computer
+	hass.data[DOMAIN]["component"] = EntityComponent(_LOGGER, DOMAIN, hass)
 
-	# Register custom services
-	async def handle_turn_on(call):
-		entity_id = call.data.get("entity_id")
-		entity = hass.states.get(entity_id)
-		if entity:
-			# Get the actual entity from our storage
-			stored_entities = hass.data.get(DOMAIN, {}).get("entities", {})
-			
-			# Find the corresponding entity
-			for entry_id, entities in stored_entities.items():
-				if isinstance(entities, dict) and "main" in entities and entities["main"].entity_id == entity_id:
-					await entities["main"].async_turn_on()
-					return
-			
-			# If not found in the new structure, try the old structure
-			for entry_id, entity_obj in stored_entities.items():
-				if not isinstance(entity_obj, dict) and entity_obj.entity_id == entity_id:
-					await entity_obj.async_turn_on()
-					return
-			
-			_LOGGER.error("Entity %s not found in computer entities", entity_id)
-		else:
-			_LOGGER.error("Entity %s not found for turn_on service", entity_id)
+	if DOMAIN in config:
+		settings = config[DOMAIN]
+		async_get_refresh_scheduler(hass).configure(
+			settings[CONF_REFRESH_JITTER],
+			settings[CONF_REFRESH_MAX_IN_FLIGHT],
+			settings[CONF_REFRESH_TIMEOUT],
+			settings[CONF_STALE_AFTER]
+		)
 
-	async def handle_turn_off(call):
-		entity_id = call.data.get("entity_id")
-		entity = hass.states.get(entity_id)
-		if entity:
-			# Get the actual entity from our storage
-			stored_entities = hass.data.get(DOMAIN, {}).get("entities", {})
-			
-			# Find the corresponding entity
-			for entry_id, entities in stored_entities.items():
-				if isinstance(entities, dict) and "main" in entities and entities["main"].entity_id == entity_id:
-					await entities["main"].async_turn_off()
-					return
-			
-			# If not found in the new structure, try the old structure
-			for entry_id, entity_obj in stored_entities.items():
-				if not isinstance(entity_obj, dict) and entity_obj.entity_id == entity_id:
-					await entity_obj.async_turn_off()
-					return
-			
-			_LOGGER.error("Entity %s not found in computer entities", entity_id)
-		else:
-			_LOGGER.error("Entity %s not found for turn_off service", entity_id)
+	# Service handlers keyed by service name and then by the role of the
+	# targeted entity (see entity_index). Each receives the target entity,
+	# its sibling entities and the service call.
+	async def turn_on_main(entity, siblings, call):
+		await entity.async_turn_on()
 
-	async def handle_set_volume_level(call):
-		entity_id = call.data.get("entity_id")
-		volume_level = call.data.get("volume_level")
-		entity = hass.states.get(entity_id)
-		if entity:
-			# Get the actual entity from our storage
-			stored_entities = hass.data.get(DOMAIN, {}).get("entities", {})
-			
-			# Find the corresponding entity
-			for entry_id, entities in stored_entities.items():
-				if isinstance(entities, dict) and "main" in entities:
-					if entities["main"].entity_id == entity_id:
-						await entities["main"].async_set_volume_level(volume_level)
-						if "volume" in entities:
-							await entities["volume"].async_update_state()
-						return
-					elif "volume" in entities and entities["volume"].entity_id == entity_id:
-						await entities["volume"].async_set_native_value(volume_level)
-						return
-			
-			# If not found in the new structure, try the old structure
-			for entry_id, entity_obj in stored_entities.items():
-				if not isinstance(entity_obj, dict) and entity_obj.entity_id == entity_id:
-					await entity_obj.async_set_volume_level(volume_level)
-					return
-			
-			_LOGGER.error("Entity %s not found in computer entities", entity_id)
+	async def turn_off_main(entity, siblings, call):
+		await entity.async_turn_off()
+
+	async def set_volume_level_main(entity, siblings, call):
+		await entity.async_set_volume_level(call.data.get("volume_level"))
+		if "volume" in siblings:
+			await siblings["volume"].async_update_state()
+
+	async def set_volume_level_volume(entity, siblings, call):
+		await entity.async_set_native_value(call.data.get("volume_level"))
+
+	async def toggle_mute_main(entity, siblings, call):
+		await entity.async_toggle_mute()
+		if "mute" in siblings:
+			await siblings["mute"].async_update_state()
+
+	async def toggle_mute_mute(entity, siblings, call):
+		if entity.is_on:
+			await entity.async_turn_off()
 		else:
-			_LOGGER.error("Entity %s not found for set_volume_level service", entity_id)
+			await entity.async_turn_on()
 
-	async def handle_toggle_mute(call):
-		entity_id = call.data.get("entity_id")
-		entity = hass.states.get(entity_id)
-		if entity:
-			# Get the actual entity from our storage
-			stored_entities = hass.data.get(DOMAIN, {}).get("entities", {})
-			
-			# Find the corresponding entity
-			for entry_id, entities in stored_entities.items():
-				if isinstance(entities, dict) and "main" in entities:
-					if entities["main"].entity_id == entity_id:
-						await entities["main"].async_toggle_mute()
-						if "mute" in entities:
-							await entities["mute"].async_update_state()
-						return
-					elif "mute" in entities and entities["mute"].entity_id == entity_id:
-						current_state = entities["mute"].is_on
-						if current_state:
-							await entities["mute"].async_turn_off()
-						else:
-							await entities["mute"].async_turn_on()
-						return
-			
-			# If not found in the new structure, try the old structure
-			for entry_id, entity_obj in stored_entities.items():
-				if not isinstance(entity_obj, dict) and entity_obj.entity_id == entity_id:
-					await entity_obj.async_toggle_mute()
-					return
-			
-			_LOGGER.error("Entity %s not found in computer entities", entity_id)
+	async def toggle_enforce_lock_main(entity, siblings, call):
+		await entity.async_toggle_enforce_lock()
+		if "enforce_lock" in siblings:
+			await siblings["enforce_lock"].async_update_state()
+		if "lock" in siblings:
+			await siblings["lock"].async_update_state()
+
+	async def toggle_enforce_lock_lock(entity, siblings, call):
+		await entity.async_press()
+		if "enforce_lock" in siblings:
+			await siblings["enforce_lock"].async_update_state()
+
+	async def toggle_enforce_lock_enforce_lock(entity, siblings, call):
+		if entity.is_on:
+			await entity.async_turn_off()
 		else:
-			_LOGGER.error("Entity %s not found for toggle_mute service", entity_id)
+			await entity.async_turn_on()
+
+	service_handlers = {
+		"turn_on": {ROLE_MAIN: turn_on_main},
+		"turn_off": {ROLE_MAIN: turn_off_main},
+		"set_volume_level": {
+			ROLE_MAIN: set_volume_level_main,
+			"volume": set_volume_level_volume,
+		},
+		"toggle_mute": {
+			ROLE_MAIN: toggle_mute_main,
+			"mute": toggle_mute_mute,
+		},
+		"toggle_enforce_lock": {
+			ROLE_MAIN: toggle_enforce_lock_main,
+			"lock": toggle_enforce_lock_lock,
+			"enforce_lock": toggle_enforce_lock_enforce_lock,
+		},
+	}
 
-	async def handle_toggle_enforce_lock(call):
+	async def handle_service(call):
+		"""Dispatch a computer.* service call to the targeted entity."""
 		entity_id = call.data.get("entity_id")
-		entity = hass.states.get(entity_id)
-		if entity:
-			# Get the actual entity from our storage
-			stored_entities = hass.data.get(DOMAIN, {}).get("entities", {})
-			
-			# Find the corresponding entity
-			for entry_id, entities in stored_entities.items():
-				if isinstance(entities, dict) and "main" in entities:
-					if entities["main"].entity_id == entity_id:
-						await entities["main"].async_toggle_enforce_lock()
-						if "enforce_lock" in entities:
-							await entities["enforce_lock"].async_update_state()
-						if "lock" in entities:
-							await entities["lock"].async_update_state()
-						return
-					elif "lock" in entities and entities["lock"].entity_id == entity_id:
-						await entities["lock"].async_press()
-						if "enforce_lock" in entities:
-							await entities["enforce_lock"].async_update_state()
-						return
-					elif "enforce_lock" in entities and entities["enforce_lock"].entity_id == entity_id:
-						current_state = entities["enforce_lock"].is_on
-						if current_state:
-							await entities["enforce_lock"].async_turn_off()
-						else:
-							await entities["enforce_lock"].async_turn_on()
-						return
-			
-			# If not found in the new structure, try the old structure
-			for entry_id, entity_obj in stored_entities.items():
-				if not isinstance(entity_obj, dict) and entity_obj.entity_id == entity_id:
-					await entity_obj.async_toggle_enforce_lock()
-					return
-			
-			_LOGGER.error("Entity %s not found in computer entities", entity_id)
-		else:
-			_LOGGER.error("Entity %s not found for toggle_enforce_lock service", entity_id)
+		target = async_lookup_entity(hass, entity_id)
+		if target is None:
+			_LOGGER.error("Entity %s not found for %s service", entity_id, call.service)
+			return
+
+		entry_id, role, entity = target
+		handler = service_handlers[call.service].get(role)
+		if handler is None:
+			_LOGGER.error("Entity %s does not support the %s service", entity_id, call.service)
+			return
+
+		siblings = hass.data[DOMAIN].get("entities", {}).get(entry_id)
+		if not isinstance(siblings, dict):
+			# Old single-entity structure has no sub-entities
+			siblings = {}
+		# Let the first command publish record the service-to-publish latency
+		with service_call_started():
+			await handler(entity, siblings, call)
 
 	# Register services
-	hass.services.async_register(DOMAIN, "turn_on", handle_turn_on)
-	hass.services.async_register(DOMAIN, "turn_off", handle_turn_off)
-	hass.services.async_register(DOMAIN, "set_volume_level", handle_set_volume_level)
-	hass.services.async_register(DOMAIN, "toggle_mute", handle_toggle_mute)
-	hass.services.async_register(DOMAIN, "toggle_enforce_lock", handle_toggle_enforce_lock)
+	for service in service_handlers:
+		hass.services.async_register(DOMAIN, service, handle_service)
 
 	return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-	"""Use a completely different pattern to set up a Computer config entry.
-	
-	This implementation avoids Home Assistant's internal ConfigEntryState
-	management by using a different approach that doesn't trigger the
-	SETUP_IN_PROGRESS state conflicts and ensures unique IDs for entities.
-	"""
-	_LOGGER.debug("Setting up Computer entry %s using custom approach", entry.entry_id)
+	"""Set up a Computer config entry."""
+	_LOGGER.debug("Setting up Computer entry %s", entry.entry_id)
+	setup_started = time.monotonic()
 	
 	# Initialize data structure
 	hass.data.setdefault(DOMAIN, {})
@@ -205,72 +174,59 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 	for key, value in entry.data.items():
 		hass.data[DOMAIN][entry.entry_id][key] = value
 	
-	# Forward setup to computer platform
-	from .computer import async_setup_entry as setup_computer_platform
-	await setup_computer_platform(hass, entry, async_add_entities=None)
-	
-	# Now set up all the required domains for sub-entities
-	# These will create the correct platform entities
-	from homeassistant.helpers.entity_platform import async_get_platforms
-	from homeassistant.components.number import DOMAIN as NUMBER_DOMAIN
-	from homeassistant.components.switch import DOMAIN as SWITCH_DOMAIN  
-	from homeassistant.components.button import DOMAIN as BUTTON_DOMAIN
-	
-	_LOGGER.debug("Setting up platform entities for entry %s", entry.entry_id)
-	
-	# Manually set up the required platforms to ensure sub-entities are registered
-	from homeassistant.setup import async_setup_component
-	
-	# First make sure all required components are set up
-	if not hass.data.get(NUMBER_DOMAIN):
-		_LOGGER.debug("Setting up number component")
-		await async_setup_component(hass, NUMBER_DOMAIN, {})
-	if not hass.data.get(SWITCH_DOMAIN):
-		_LOGGER.debug("Setting up switch component")
-		await async_setup_component(hass, SWITCH_DOMAIN, {})
-	if not hass.data.get(BUTTON_DOMAIN):
-		_LOGGER.debug("Setting up button component")
-		await async_setup_component(hass, BUTTON_DOMAIN, {})
-	
-	# Register our sub-entities with Home Assistant
-	# This is done by calling specific helper functions from computer.py
-	from .computer import register_sub_entities
-	_LOGGER.debug("Registering sub-entities for entry %s", entry.entry_id)
-	try:
-		success = await register_sub_entities(hass, entry)
-		if success:
-			_LOGGER.debug("Successfully registered all sub-entities for entry %s", entry.entry_id)
-		else:
-			_LOGGER.warning("Some sub-entities may not have been registered for entry %s", entry.entry_id)
-	except Exception as e:
-		_LOGGER.error("Error registering sub-entities: %s", e)
-	
-	_LOGGER.debug("Successfully completed setup for Computer entry %s", entry.entry_id)
+	# Apply option changes to the running device
+	entry.async_on_unload(entry.add_update_listener(async_options_updated))
+	
+	# Set up the main entity (this runs computer.async_setup_entry, which also
+	# creates the sub-entities), then forward the sub-entity platforms
+	component = hass.data[DOMAIN]["component"]
+	if not await component.async_setup_entry(entry):
+		# Let a retry start from scratch
+		await component.async_unload_entry(entry)
+		_async_remove_entry_data(hass, entry.entry_id)
+		return False
+	await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+	
+	_LOGGER.info(
+		"Set up Computer entry %s in %.2f s", entry.entry_id, time.monotonic() - setup_started
+	)
 	return True
 
+async def async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+	"""Apply updated options without reloading the entry."""
+	entities = hass.data.get(DOMAIN, {}).get("entities", {}).get(entry.entry_id)
+	if isinstance(entities, dict) and "main" in entities:
+		entities["main"].async_apply_options({**entry.data, **entry.options})
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-	"""Unload a config entry more directly, matching our setup pattern."""
+	"""Unload a Computer config entry."""
 	_LOGGER.debug("Unloading Computer entry %s", entry.entry_id)
 	
-	# No need to try unloading through Home Assistant's system - we never registered
-	# our platforms with it. We just need to clean up our own data.
-	unload_ok = True
+	unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+	unload_ok = await hass.data[DOMAIN]["component"].async_unload_entry(entry) and unload_ok
 	
 	# Clean up data regardless of unload success
-	if entry.entry_id in hass.data.get(DOMAIN, {}):
-		hass.data[DOMAIN].pop(entry.entry_id)
-		_LOGGER.debug("Removed data for entry %s", entry.entry_id)
+	_async_remove_entry_data(hass, entry.entry_id)
+	
+	return unload_ok 
+
+def _async_remove_entry_data(hass: HomeAssistant, entry_id: str) -> None:
+	"""Drop everything kept in hass.data for an entry.
+
+	Once the last entry is gone, the shared helpers that still hold
+	listeners are released too.
+	"""
+	domain_data = hass.data.get(DOMAIN, {})
+	domain_data.pop(entry_id, None)
+	
+	# Drop the entry's entities from the service lookup index
+	async_remove_entry_index(hass, entry_id)
 	
-	# Clean up entity data if it exists
-	if "entities" in hass.data.get(DOMAIN, {}):
-		if entry.entry_id in hass.data[DOMAIN]["entities"]:
-			if isinstance(hass.data[DOMAIN]["entities"][entry.entry_id], dict):
-				# New structure with multiple entities
-				hass.data[DOMAIN]["entities"].pop(entry.entry_id)
-				_LOGGER.debug("Removed entities for entry %s (multi-entity structure)", entry.entry_id)
-			else:
-				# Old structure with single entity
-				hass.data[DOMAIN]["entities"].pop(entry.entry_id)
-				_LOGGER.debug("Removed entity for entry %s (single entity structure)", entry.entry_id)
+	entities = domain_data.get("entities", {})
+	if entities.pop(entry_id, None) is not None:
+		_LOGGER.debug("Removed entities for entry %s", entry_id)
 	
-	return unload_ok 
\ No newline at end of file
+	if not entities:
+		mqtt_entity_index = domain_data.pop("mqtt_entity_index", None)
+		if mqtt_entity_index is not None:
+			mqtt_entity_index.async_close()
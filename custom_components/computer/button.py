@@ -0,0 +1,8 @@
+"""Button platform for the Computer integration (lock)."""
+from .const import DOMAIN
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+	"""Add the lock button of a Computer."""
+	entities = hass.data[DOMAIN]["entities"][entry.entry_id]
+	async_add_entities([entities["lock"]])
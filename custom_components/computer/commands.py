@@ -0,0 +1,210 @@
+"""Acknowledgement tracking and deduplication of commands sent to HASS.Agent."""
+import asyncio
+import logging
+
+from .const import COMMAND_ACK_TIMEOUT, COMMAND_RETRIES, COMMAND_SETTLE_TIME
+from .enforce_lock import SESSION_LOCKED
+from .timer_wheel import async_get_timer_wheel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Command kinds and the HASS.Agent sensor that confirms them
+COMMAND_VOLUME = "volume"  # currentvolume reports the new level
+COMMAND_LOCK = "lock"  # sessionstate reports "locked"
+COMMAND_MUTE = "mute"  # not reported by HASS.Agent
+
+
+def volume_confirmed_by(percent):
+	"""Return a matcher for the currentvolume report confirming a volume percentage."""
+	def matches(payload):
+		try:
+			# HASS.Agent may round the level it reports
+			return abs(float(payload) - percent) <= 1
+		except ValueError:
+			return False
+	return matches
+
+
+def session_locked(payload):
+	"""Return True for the sessionstate report confirming a lock command."""
+	return str(payload).lower() == SESSION_LOCKED
+
+
+class _PendingCommand:
+	"""A command waiting for the state that confirms it."""
+
+	__slots__ = ("matches", "resend", "sent_at", "attempts")
+
+	def __init__(self, matches, resend, now):
+		"""Initialize the pending command."""
+		self.matches = matches
+		self.resend = resend
+		self.sent_at = now
+		self.attempts = 1
+
+
+class CommandTracker:
+	"""Match commands sent to HASS.Agent with the state that confirms them.
+
+	HASS.Agent does not acknowledge commands, but a set volume command is
+	confirmed by the next currentvolume report carrying the new level and a
+	lock command by the next sessionstate report of "locked". One command per
+	kind is pending at a time; a newer command of the same kind replaces it.
+	When the confirming state arrives the round trip from the first send is
+	recorded. Without it the command is sent again every `timeout` seconds,
+	up to `retries` times, and then expires. Timeouts run on the shared
+	timer wheel.
+	"""
+
+	def __init__(self, hass, metrics, key, name, timeout=COMMAND_ACK_TIMEOUT, retries=COMMAND_RETRIES):
+		"""Initialize the tracker.
+
+		key makes the timer wheel keys of this device unique.
+		"""
+		self.hass = hass
+		self._metrics = metrics
+		self._key = key
+		self._name = name
+		self._timeout = timeout
+		self._retries = retries
+		# kind -> _PendingCommand
+		self._pending = {}
+
+	def sent(self, kind, matches, resend=None):
+		"""Start waiting for the state confirming a command that was just sent.
+
+		matches is called with each state payload of that kind and returns
+		True for the confirming one. resend is an async callable publishing
+		the command again, or None to let it expire without retrying.
+		"""
+		self._pending[kind] = _PendingCommand(matches, resend, self.hass.loop.time())
+		self._schedule(kind)
+
+	def observed(self, kind, payload):
+		"""Handle a state reported by HASS.Agent; return True if it confirmed a command."""
+		pending = self._pending.get(kind)
+		if pending is None or not pending.matches(payload):
+			return False
+		del self._pending[kind]
+		async_get_timer_wheel(self.hass).cancel((self._key, kind))
+		round_trip = self.hass.loop.time() - pending.sent_at
+		self._metrics.record_command_ack(kind, round_trip)
+		_LOGGER.debug(
+			"%s command to %s confirmed after %.0f ms (%d attempt(s))",
+			kind, self._name, round_trip * 1000, pending.attempts
+		)
+		return True
+
+	def is_pending(self, kind):
+		"""Return True while a command of this kind awaits confirmation."""
+		return kind in self._pending
+
+	def cancel(self):
+		"""Stop waiting for every pending command."""
+		wheel = async_get_timer_wheel(self.hass)
+		for kind in self._pending:
+			wheel.cancel((self._key, kind))
+		self._pending.clear()
+
+	def _schedule(self, kind):
+		"""(Re)arm the confirmation timeout of a pending command."""
+		async_get_timer_wheel(self.hass).schedule(
+			(self._key, kind), self._timeout, lambda: self._timed_out(kind)
+		)
+
+	def _timed_out(self, kind):
+		"""Retry a command that was not confirmed in time, or give up on it."""
+		pending = self._pending.get(kind)
+		if pending is None:
+			return
+		if pending.resend is not None and pending.attempts <= self._retries:
+			pending.attempts += 1
+			self._metrics.record_command_retry()
+			_LOGGER.debug(
+				"%s command to %s not confirmed, sending again (attempt %d)",
+				kind, self._name, pending.attempts
+			)
+			self.hass.async_create_task(pending.resend())
+			self._schedule(kind)
+			return
+		del self._pending[kind]
+		self._metrics.record_command_expired()
+		_LOGGER.info(
+			"%s command to %s was not confirmed after %d attempt(s)",
+			kind, self._name, pending.attempts
+		)
+
+
+class _Flight:
+	"""A command request being carried out."""
+
+	__slots__ = ("desired", "task", "settles_at")
+
+	def __init__(self, desired):
+		"""Initialize the flight."""
+		self.desired = desired
+		# Set once run() has been started
+		self.task = None
+		# Loop time from which new requests start a new flight
+		self.settles_at = float("inf")
+
+	def running(self):
+		"""Return True until run() has finished."""
+		return self.task is None or not self.task.done()
+
+
+class SingleFlight:
+	"""Merge concurrent requests for the same command into one.
+
+	A request for a command runs unless a flight of that command with the
+	same desired state is in progress or finished less than `settle`
+	seconds ago, in which case it waits for that flight instead. Requests
+	with join_any (toggles) also join a flight for the other state while it
+	is running, so a burst of toggles from several sources is carried out
+	once; run() should therefore last until its command has gone out. Once
+	that flight has finished, a toggle asks for the opposite of the state
+	it left behind and runs. A request for a different state waits for the
+	running flight and is then carried out on its own.
+	"""
+
+	def __init__(self, hass, metrics, settle=COMMAND_SETTLE_TIME):
+		"""Initialize the flights."""
+		self.hass = hass
+		self._metrics = metrics
+		self._settle = settle
+		# command kind -> _Flight
+		self._flights = {}
+
+	async def async_run(self, kind, desired, run, join_any=False):
+		"""Carry out run() for a command request unless it joins a flight.
+
+		Returns True if this request started the flight.
+		"""
+		flight = self._flights.get(kind)
+		while flight is not None and flight.running():
+			if flight.task is None:
+				# Requested by run() itself while it is being started, which
+				# cannot wait for its own flight
+				self._metrics.record_command_merged()
+				return False
+			if join_any or flight.desired == desired:
+				self._metrics.record_command_merged()
+				await asyncio.shield(flight.task)
+				return False
+			await asyncio.shield(flight.task)
+			flight = self._flights.get(kind)
+		if (
+			flight is not None and flight.desired == desired
+			and self.hass.loop.time() < flight.settles_at
+		):
+			self._metrics.record_command_merged()
+			return False
+
+		# Registered before run() starts, which may be straight away
+		flight = self._flights[kind] = _Flight(desired)
+		flight.task = self.hass.async_create_task(run())
+		try:
+			await asyncio.shield(flight.task)
+		finally:
+			flight.settles_at = self.hass.loop.time() + self._settle
+		return True
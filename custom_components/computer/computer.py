@@ -1,11 +1,11 @@
 """Platform for Computer integration."""
 import logging
-import json
-import asyncio
-from homeassistant.helpers.entity import Entity
-from homeassistant.const import STATE_ON, STATE_OFF
+import time
+from datetime import timedelta
+from homeassistant.helpers.restore_state import RestoreEntity, RestoredExtraData
+from homeassistant.const import STATE_ON, STATE_OFF, EntityCategory
 from homeassistant.helpers import device_registry as dr
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.components import mqtt
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.components.number import NumberEntity
@@ -20,276 +20,40 @@ from .const import (
 	CONF_POWER_ON_ACTION, CONF_POWER_OFF_ACTION,
 	POWER_ON_POWER, POWER_ON_WAKE,
 	POWER_OFF_POWER, POWER_OFF_HIBERNATE, POWER_OFF_SLEEP,
-	ATTR_VOLUME_LEVEL, ATTR_ACTIVE_WINDOW, ATTR_SESSION_STATE
+	ATTR_VOLUME_LEVEL, ATTR_ACTIVE_WINDOW, ATTR_SESSION_STATE,
+	CONF_VOLUME_DEBOUNCE, CONF_VOLUME_MAX_RATE,
+	DEFAULT_VOLUME_DEBOUNCE, DEFAULT_VOLUME_MAX_RATE,
+	CONF_LOGBOOK_WINDOW, DEFAULT_LOGBOOK_WINDOW,
+	CONF_RETAIN_STATE, DEFAULT_RETAIN_STATE,
+	CONF_RESYNC_INTERVAL, DEFAULT_RESYNC_INTERVAL,
+	CONF_COMBINED_STATE, DEFAULT_COMBINED_STATE,
+	CONF_LEGACY_TOPICS, DEFAULT_LEGACY_TOPICS,
+	CONF_RESTORE_MAX_AGE, DEFAULT_RESTORE_MAX_AGE,
+	CONF_HEARTBEAT_TIMEOUT, DEFAULT_HEARTBEAT_TIMEOUT,
+	CONF_CONFIRMED_COMMANDS, DEFAULT_CONFIRMED_COMMANDS,
+	CONF_OFFLINE_QUEUE_TTL, DEFAULT_OFFLINE_QUEUE_TTL,
+	METRICS_REFRESH_INTERVAL
 )
+from .commands import (
+	COMMAND_LOCK, COMMAND_MUTE, COMMAND_VOLUME,
+	CommandTracker, SingleFlight, session_locked, volume_confirmed_by
+)
+from .context import DeviceContext
+from .enforce_lock import SESSION_LOCKED, EnforceLock
+from .entity_index import IndexedEntity
+from .mqtt_entity_index import async_get_mqtt_entity_index
+from .outbound import LANE_COMMAND, LANE_POWER, LANE_SECURITY, LANE_STATE, async_get_outbound
+from .outbox import CommandOutbox
+from .mqtt_router import SUFFIX_AVAILABILITY, async_get_router
+from .refresh import async_get_refresh_scheduler
+from .state_document import build_state_document
+from .state_publisher import StatePublisher
+from .throttle import CommandThrottle
+from .timer_wheel import async_get_timer_wheel
+from .metrics import SERVICE_CALL_STARTED, timed_service_call
 
 _LOGGER = logging.getLogger(__name__)
 
-# Constants for MQTT topics
-MQTT_BASE_TOPIC = "homeassistant"
-
-async def register_sub_entities(hass, config_entry):
-	"""Register sub-entities directly with Home Assistant."""
-	_LOGGER.debug("Registering sub-entities for Computer")
-	
-	# Get the stored entities from DOMAIN data
-	entities = hass.data.get(DOMAIN, {}).get("entities", {}).get(config_entry.entry_id, {})
-	if not entities or not isinstance(entities, dict):
-		_LOGGER.error("No entities found for entry %s or invalid structure", config_entry.entry_id)
-		return False
-	
-	try:
-		# Get entity registry
-		from homeassistant.helpers import entity_registry as er
-		registry = er.async_get(hass)
-		
-		# Add state listeners for main entity to update its sub-entities
-		main_entity = entities.get("main")
-		if main_entity:
-			_LOGGER.debug("Setting up state listeners for main entity: %s", main_entity.entity_id)
-			
-			async def handle_main_state_change(event):
-				"""Handle state changes of the main entity and update sub-entities if needed."""
-				new_state = event.data.get("new_state")
-				if new_state is None:
-					return
-					
-				# Check if we need to update the sub-entities
-				attributes = new_state.attributes
-				
-				# Update volume if it's changed
-				if "volume" in entities and ATTR_VOLUME_LEVEL in attributes:
-					volume_entity = entities["volume"]
-					await volume_entity.async_update_state()
-				
-				# Update mute if it's changed
-				if "mute" in entities and "muted" in attributes:
-					mute_entity = entities["mute"]
-					await mute_entity.async_update_state()
-				
-				# Update enforce_lock if it's changed
-				if "enforce_lock" in entities and "enforce_lock" in attributes:
-					enforce_lock_entity = entities["enforce_lock"]
-					await enforce_lock_entity.async_update_state()
-			
-			# Track state changes for the main entity
-			from homeassistant.helpers.event import async_track_state_change_event
-			async_track_state_change_event(
-				hass,
-				[main_entity.entity_id],
-				handle_main_state_change
-			)
-		
-		# Volume entity (number)
-		if "volume" in entities:
-			volume_entity = entities["volume"]
-			_LOGGER.debug("Registering volume entity: %s", volume_entity.entity_id)
-			
-			# Ensure entity exists in registry properly
-			registry.async_get_or_create(
-				domain="number",
-				platform=DOMAIN,
-				unique_id=volume_entity.unique_id,
-				config_entry=config_entry,
-				suggested_object_id=volume_entity.entity_id.split('.', 1)[1]
-			)
-			
-			# Set initial state
-			state_value = str(volume_entity.native_value)
-			attributes = {
-				"friendly_name": volume_entity.name,
-				"icon": volume_entity.icon,
-				"min": volume_entity.native_min_value,
-				"max": volume_entity.native_max_value,
-				"step": volume_entity.native_step,
-				"mode": "auto",
-				"unit_of_measurement": "%"
-			}
-			hass.states.async_set(volume_entity.entity_id, state_value, attributes)
-			
-			# Make sure it responds to service calls
-			async def volume_service_handler(call):
-				"""Handle services for volume entity."""
-				vol_value = call.data.get("value")
-				entity_id = call.data.get("entity_id")
-				
-				if entity_id != volume_entity.entity_id:
-					return
-					
-				if vol_value is not None:
-					_LOGGER.debug("Handling number.set_value service for %s with value %s", 
-						volume_entity.entity_id, vol_value)
-					await volume_entity.async_set_native_value(float(vol_value))
-			
-			# Use EntityComponent to properly register
-			from homeassistant.helpers.entity_component import EntityComponent
-			number_component = EntityComponent(_LOGGER, "number", hass)
-			await number_component.async_add_entities([volume_entity])
-		
-		# Mute entity (switch)
-		if "mute" in entities:
-			mute_entity = entities["mute"]
-			_LOGGER.debug("Registering mute entity: %s", mute_entity.entity_id)
-			
-			# Ensure entity exists in registry properly
-			registry.async_get_or_create(
-				domain="switch",
-				platform=DOMAIN,
-				unique_id=mute_entity.unique_id,
-				config_entry=config_entry,
-				suggested_object_id=mute_entity.entity_id.split('.', 1)[1]
-			)
-			
-			# Set initial state
-			state_value = "on" if mute_entity.is_on else "off"
-			attributes = {
-				"friendly_name": mute_entity.name,
-				"icon": mute_entity.icon
-			}
-			hass.states.async_set(mute_entity.entity_id, state_value, attributes)
-			
-			# Make sure it responds to service calls
-			async def mute_on_service_handler(call):
-				"""Handle turn_on for mute entity."""
-				_LOGGER.debug("Handling switch.turn_on service for %s", mute_entity.entity_id)
-				await mute_entity.async_turn_on()
-				
-			async def mute_off_service_handler(call):
-				"""Handle turn_off for mute entity."""
-				_LOGGER.debug("Handling switch.turn_off service for %s", mute_entity.entity_id)
-				await mute_entity.async_turn_off()
-			
-			# Use EntityComponent to properly register  
-			from homeassistant.helpers.entity_component import EntityComponent
-			switch_component = EntityComponent(_LOGGER, "switch", hass)
-			await switch_component.async_add_entities([mute_entity])
-		
-		# Lock entity (button)
-		if "lock" in entities:
-			lock_entity = entities["lock"]
-			_LOGGER.debug("Registering lock entity: %s", lock_entity.entity_id)
-			
-			# Ensure entity exists in registry properly
-			registry.async_get_or_create(
-				domain="button",
-				platform=DOMAIN,
-				unique_id=lock_entity.unique_id,
-				config_entry=config_entry,
-				suggested_object_id=lock_entity.entity_id.split('.', 1)[1]
-			)
-			
-			# Set initial state
-			attributes = {
-				"friendly_name": lock_entity.name,
-				"icon": lock_entity.icon
-			}
-			hass.states.async_set(lock_entity.entity_id, "unknown", attributes)
-			
-			# Make sure it responds to service calls
-			async def lock_press_service_handler(call):
-				"""Handle press for lock button entity."""
-				_LOGGER.debug("Handling button.press service for %s", lock_entity.entity_id)
-				await lock_entity.async_press()
-				
-			# Use EntityComponent to properly register
-			from homeassistant.helpers.entity_component import EntityComponent
-			button_component = EntityComponent(_LOGGER, "button", hass)
-			await button_component.async_add_entities([lock_entity])
-		
-		# Enforce lock entity (switch)
-		if "enforce_lock" in entities:
-			enforce_lock_entity = entities["enforce_lock"]
-			_LOGGER.debug("Registering enforce lock entity: %s", enforce_lock_entity.entity_id)
-			
-			# Ensure entity exists in registry properly
-			registry.async_get_or_create(
-				domain="switch",
-				platform=DOMAIN,
-				unique_id=enforce_lock_entity.unique_id,
-				config_entry=config_entry,
-				suggested_object_id=enforce_lock_entity.entity_id.split('.', 1)[1]
-			)
-			
-			# Set initial state
-			state_value = "on" if enforce_lock_entity.is_on else "off"
-			attributes = {
-				"friendly_name": enforce_lock_entity.name,
-				"icon": enforce_lock_entity.icon
-			}
-			hass.states.async_set(enforce_lock_entity.entity_id, state_value, attributes)
-			
-			# Make sure it responds to service calls
-			async def enforce_lock_on_service_handler(call):
-				"""Handle turn_on for enforce lock entity."""
-				_LOGGER.debug("Handling switch.turn_on service for %s", enforce_lock_entity.entity_id)
-				await enforce_lock_entity.async_turn_on()
-				
-			async def enforce_lock_off_service_handler(call):
-				"""Handle turn_off for enforce lock entity."""
-				_LOGGER.debug("Handling switch.turn_off service for %s", enforce_lock_entity.entity_id)
-				await enforce_lock_entity.async_turn_off()
-				
-			# Use EntityComponent to properly register (reuse previous component)
-			await switch_component.async_add_entities([enforce_lock_entity])
-		
-		# Active Window entity (sensor)
-		if "active_window" in entities:
-			active_window_entity = entities["active_window"]
-			_LOGGER.debug("Registering active window entity: %s", active_window_entity.entity_id)
-			
-			# Ensure entity exists in registry properly
-			registry.async_get_or_create(
-				domain="sensor",
-				platform=DOMAIN,
-				unique_id=active_window_entity.unique_id,
-				config_entry=config_entry,
-				suggested_object_id=active_window_entity.entity_id.split('.', 1)[1]
-			)
-			
-			# Set initial state
-			attributes = {
-				"friendly_name": active_window_entity.name,
-				"icon": active_window_entity.icon
-			}
-			hass.states.async_set(active_window_entity.entity_id, active_window_entity.state, attributes)
-			
-			# Use EntityComponent to properly register
-			from homeassistant.helpers.entity_component import EntityComponent
-			sensor_component = EntityComponent(_LOGGER, "sensor", hass)
-			await sensor_component.async_add_entities([active_window_entity])
-		
-		# Session State entity (sensor)
-		if "session_state" in entities:
-			session_state_entity = entities["session_state"]
-			_LOGGER.debug("Registering session state entity: %s", session_state_entity.entity_id)
-			
-			# Ensure entity exists in registry properly
-			registry.async_get_or_create(
-				domain="sensor",
-				platform=DOMAIN,
-				unique_id=session_state_entity.unique_id,
-				config_entry=config_entry,
-				suggested_object_id=session_state_entity.entity_id.split('.', 1)[1]
-			)
-			
-			# Set initial state
-			attributes = {
-				"friendly_name": session_state_entity.name,
-				"icon": session_state_entity.icon
-			}
-			hass.states.async_set(session_state_entity.entity_id, session_state_entity.state, attributes)
-			
-			# Use EntityComponent to properly register
-			if 'sensor_component' not in locals():
-				sensor_component = EntityComponent(_LOGGER, "sensor", hass)
-			await sensor_component.async_add_entities([session_state_entity])
-		
-		_LOGGER.debug("Successfully registered all sub-entities")
-		return True
-	except Exception as e:
-		_LOGGER.error("Error registering sub-entities: %s", e)
-		return False
-
 async def async_setup_entry(hass, config_entry, async_add_entities):
 	"""Set up the Computer device from a config entry."""
 	_LOGGER.debug("Starting setup for config entry: %s", config_entry.entry_id)
@@ -297,23 +61,32 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 	device_name = config_entry.data[CONF_DEVICE_NAME]
 	_LOGGER.debug("Device name: %s", device_name)
 	
+	# Options override the defaults; the entry data holds the device itself
+	config = {**config_entry.data, **config_entry.options}
+
 	try:
+		# Shared per-device context; entities get filled in below
+		device_entities = {}
+		ctx = DeviceContext.create(
+			hass,
+			config_entry.entry_id,
+			device_name,
+			device_entities,
+			config.get(CONF_LOGBOOK_WINDOW, DEFAULT_LOGBOOK_WINDOW)
+		)
+
 		# Create main entity
-		entity = ComputerDevice(hass, config_entry.entry_id, config_entry.data)
+		entity = ComputerDevice(hass, ctx, config)
 
 		# Create additional entities
-		volume_entity = ComputerVolumeEntity(hass, config_entry.entry_id, config_entry.data, entity)
-		mute_entity = ComputerMuteEntity(hass, config_entry.entry_id, config_entry.data, entity)
-		lock_button = ComputerLockButton(hass, config_entry.entry_id, config_entry.data, entity)
-		enforce_lock_entity = ComputerEnforceLockSwitch(hass, config_entry.entry_id, config_entry.data, entity)
-		active_window_entity = ComputerActiveWindowSensor(hass, config_entry.entry_id, config_entry.data, entity)
-		session_state_entity = ComputerSessionStateSensor(hass, config_entry.entry_id, config_entry.data, entity)
-		
-		# Store entity for later access (before registration)
-		hass.data.setdefault(DOMAIN, {})
-		if "entities" not in hass.data[DOMAIN]:
-			hass.data[DOMAIN]["entities"] = {}
-		hass.data[DOMAIN]["entities"][config_entry.entry_id] = {
+		volume_entity = ComputerVolumeEntity(hass, ctx, config, entity)
+		mute_entity = ComputerMuteEntity(hass, ctx, config, entity)
+		lock_button = ComputerLockButton(hass, ctx, config, entity)
+		enforce_lock_entity = ComputerEnforceLockSwitch(hass, ctx, config, entity)
+		active_window_entity = ComputerActiveWindowSensor(hass, ctx, config, entity)
+		session_state_entity = ComputerSessionStateSensor(hass, ctx, config, entity)
+		
+		device_entities.update({
 			"main": entity,
 			"volume": volume_entity,
 			"mute": mute_entity,
@@ -321,34 +94,20 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 			"enforce_lock": enforce_lock_entity,
 			"active_window": active_window_entity,
 			"session_state": session_state_entity
-		}
+		})
+		# Diagnostic sensors for the device's runtime metrics
+		for key in METRIC_SENSORS:
+			device_entities[f"metric_{key}"] = ComputerMetricSensor(hass, ctx, config, entity, key)
 		
-		# If async_add_entities is None, we need to register using entity component
-		if async_add_entities is None:
-			_LOGGER.debug("Using simplified entity registration as async_add_entities is None")
-			
-			# Register the main computer entity using its domain
-			from homeassistant.helpers.entity_component import EntityComponent
-			computer_component = EntityComponent(_LOGGER, DOMAIN, hass)
-			await computer_component.async_add_entities([entity])
-			
-			# Sub-entities will be registered externally by the register_sub_entities function
-			_LOGGER.debug("Sub-entities will be registered separately via register_sub_entities")
-		else:
-			_LOGGER.debug("Using standard async_add_entities for entity registration")
-			# Only register the main entity here - sub-entities get registered separately 
-			# to ensure they go to the proper domains
-			async_add_entities([entity])
-			
-			# Also call register_sub_entities to register them with their appropriate domains
-			from homeassistant.setup import async_setup_component
-			await async_setup_component(hass, "number", {})
-			await async_setup_component(hass, "switch", {})
-			await async_setup_component(hass, "button", {})
-			await async_setup_component(hass, "sensor", {})
-			
-			# Register the sub-entities directly
-			await register_sub_entities(hass, config_entry)
+		# Store entity for later access (before registration)
+		hass.data.setdefault(DOMAIN, {})
+		if "entities" not in hass.data[DOMAIN]:
+			hass.data[DOMAIN]["entities"] = {}
+		hass.data[DOMAIN]["entities"][config_entry.entry_id] = device_entities
+		
+		# Only the main entity belongs to this platform; the sub-entities are
+		# added by the number, switch, button and sensor platforms
+		async_add_entities([entity])
 		
 		_LOGGER.debug("Added entities for Computer %s to Home Assistant", device_name)
 	except Exception as e:
@@ -372,15 +131,15 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 	from homeassistant.helpers import entity_registry as er
 	entity_registry = er.async_get(hass)
 	
-	# Link existing MQTT entities to our device if they match the pattern
+	# Link the HASS.Agent MQTT entities of this computer to our device
+	# (the entities of the MQTT device named after it, from the shared index)
+	mqtt_entity_ids = async_get_mqtt_entity_index(hass).async_lookup(device_name_case)
 	mqtt_entities = [
-		ent for ent in entity_registry.entities.values()
-		if (ent.platform == "mqtt" and 
-			device_name_case in ent.entity_id and 
-			ent.device_id != device.id)
+		ent for ent in map(entity_registry.async_get, mqtt_entity_ids)
+		if ent is not None and ent.device_id != device.id
 	]
 	
-	_LOGGER.info("Found %d MQTT entities matching device name %s", len(mqtt_entities), device_name_case)
+	_LOGGER.info("Found %d MQTT entities for device name %s", len(mqtt_entities), device_name_case)
 	
 	# Associate entities with our device
 	for ent in mqtt_entities:
@@ -393,52 +152,6 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 		except Exception as e:
 			_LOGGER.error("Failed to associate entity %s with device: %s", ent.entity_id, e)
 			
-	# Ensure our entities are fully loaded and registered
-	_LOGGER.warning("Checking for entity problems with computer entities")
-	
-	# Force registration of entities by domain
-	button_entities = []
-	switch_entities = []
-	number_entities = []
-	sensor_entities = []
-	
-	for entity_key, sub_entity in hass.data[DOMAIN]["entities"][config_entry.entry_id].items():
-		if entity_key != "main":
-			# Force the entity to be available
-			sub_entity._attr_available = True
-			
-			# Group by domain
-			entity_id = sub_entity.entity_id
-			domain = entity_id.split(".", 1)[0]
-			
-			_LOGGER.warning("Processing entity %s with domain %s", entity_id, domain)
-			
-			if domain == "button":
-				button_entities.append(sub_entity)
-			elif domain == "switch":
-				switch_entities.append(sub_entity)
-			elif domain == "number":
-				number_entities.append(sub_entity)
-			elif domain == "sensor":
-				sensor_entities.append(sub_entity)
-				
-	# Manually register entities by domain
-	if button_entities:
-		_LOGGER.warning("Manually registering %d button entities", len(button_entities))
-		await async_load_platform_entities(hass, "button", DOMAIN, button_entities)
-		
-	if switch_entities:
-		_LOGGER.warning("Manually registering %d switch entities", len(switch_entities))
-		await async_load_platform_entities(hass, "switch", DOMAIN, switch_entities)
-		
-	if number_entities:
-		_LOGGER.warning("Manually registering %d number entities", len(number_entities))
-		await async_load_platform_entities(hass, "number", DOMAIN, number_entities)
-		
-	if sensor_entities:
-		_LOGGER.warning("Manually registering %d sensor entities", len(sensor_entities))
-		await async_load_platform_entities(hass, "sensor", DOMAIN, sensor_entities)
-
 	# Verify MQTT is available
 	if not await mqtt.async_wait_for_mqtt_client(hass):
 		_LOGGER.error("MQTT integration is not available or broker is not connected")
@@ -453,118 +166,167 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 	mqtt_discovery_pattern = f"homeassistant/+/{device_name_case}/+/config"
 	_LOGGER.warning("Checking for MQTT discovery topics matching: %s", mqtt_discovery_pattern)
 	
-	# HASS.Agent sensor topics 
-	activewindow_topic = f"{MQTT_BASE_TOPIC}/sensor/{device_name_case}/{device_name_case}_activewindow/state"
-	sessionstate_topic = f"{MQTT_BASE_TOPIC}/sensor/{device_name_case}/{device_name_case}_sessionstate/state"
-	currentvolume_topic = f"{MQTT_BASE_TOPIC}/sensor/{device_name_case}/{device_name_case}_currentvolume/state"
-	availability_topic = f"{MQTT_BASE_TOPIC}/sensor/{device_name_case}/availability"
-	
-	# HASS.Agent button command topics - these are the actual topics we need to send commands to
-	lock_button_topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_lock/set"
-	mute_button_topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_mute/set"
-	setvolume_button_topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_setvolume/set"
-	publishallsensors_button_topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_publishallsensors/set"
-	
+	# HASS.Agent topics, resolved once in the device context
+	topics = ctx.topics
 	_LOGGER.warning("HASS.Agent MQTT topics:")
-	_LOGGER.warning("  Sensors: %s, %s, %s", activewindow_topic, sessionstate_topic, currentvolume_topic)
-	_LOGGER.warning("  Buttons: %s, %s, %s, %s", lock_button_topic, mute_button_topic, setvolume_button_topic, publishallsensors_button_topic)
+	_LOGGER.warning("  Sensors: %s, %s, %s", topics.activewindow, topics.sessionstate, topics.currentvolume)
+	_LOGGER.warning("  Buttons: %s, %s, %s, %s", topics.lock, topics.mute, topics.setvolume, topics.publishallsensors)
+
+	refresh = async_get_refresh_scheduler(hass)
+
+	def route(handler, category, sensor=True):
+		"""Wrap a per-sensor handler with decoding, echo suppression and logging.
+
+		sensor is False for topics that do not show the computer is alive
+		(availability may be the broker's last will). Retained messages
+		never do.
+		"""
+		async def message_received(msg, received):
+			"""Handle an incoming MQTT message received at monotonic time received."""
+			ctx.metrics.record_inbound(category)
+			try:
+				payload = msg.payload.decode("utf-8") if isinstance(msg.payload, bytes) else str(msg.payload)
+			except (AttributeError, UnicodeDecodeError) as e:
+				_LOGGER.error("Failed to decode MQTT payload for %s: %s", msg.topic, e)
+				ctx.metrics.record_dropped()
+				return
+
+			# Drop messages we published ourselves from _publish_state before they
+			# reach the entities, otherwise every update is bounced straight back
+			if ctx.echo.is_echo(msg.topic, payload):
+				ctx.metrics.record_echo()
+				return
 
-	# Define MQTT message handler
-	async def message_received(msg):
-		"""Handle incoming MQTT messages."""
-		try:
-			payload = msg.payload.decode("utf-8") if isinstance(msg.payload, bytes) else str(msg.payload)
 			_LOGGER.warning("Received MQTT message on topic: %s, payload: %s", msg.topic, payload)
-			
-			# Log this to the Home Assistant logbook
-			from homeassistant.components import logbook
-			await logbook.async_log_entry(
-				hass,
-				"MQTT Message",
-				f"Received on {msg.topic}: {payload[:50]}{'...' if len(payload) > 50 else ''}",
-				domain="mqtt"
+			# A retained message may be a replay of an old value (or one we
+			# published ourselves with retain_state), so only a live message
+			# shows the computer is alive
+			if sensor and not getattr(msg, "retain", False):
+				entity.heartbeat()
+				refresh.seen(device_name_case, category)
+			# HASS.Agent has just put this value on the topic, so do not publish it again
+			entity._state_publisher.mark_published(msg.topic, payload)
+
+			# Log this to the Home Assistant logbook (counted per category and
+			# written once per aggregation window unless aggregation is off)
+			ctx.logbook.record(
+				category,
+				f"Received on {msg.topic}: {payload[:50]}{'...' if len(payload) > 50 else ''}"
 			)
-		except (AttributeError, UnicodeDecodeError) as e:
-			_LOGGER.error("Failed to decode MQTT payload for %s: %s", msg.topic, e)
-			return
 
-		# HASS.Agent sensor topics
-		if msg.topic == activewindow_topic:
-			_LOGGER.warning("Active window update from HASS.Agent: %s", payload)
-			await entity.set_active_window(payload)
-			await active_window_entity.async_update_state()
-		elif msg.topic == sessionstate_topic:
-			_LOGGER.warning("Session state update from HASS.Agent: %s", payload)
-			await entity.set_session_state(payload)
-			await session_state_entity.async_update_state()
-		elif msg.topic == currentvolume_topic:
-			try:
-				_LOGGER.warning("Current volume update from HASS.Agent: %s", payload)
-				volume = float(payload) / 100.0  # Convert percentage to 0-1 range
-				await entity.async_set_volume_level(volume)
-				await volume_entity.async_update_state()
-			except ValueError as e:
-				_LOGGER.error("Invalid volume value received: %s, error: %s", payload, e)
-		elif msg.topic == availability_topic:
-			_LOGGER.warning("Availability update from HASS.Agent: %s", payload)
-			# Update availability of all entities
-			is_available = payload.lower() == "online"
-			entity._attr_available = is_available
-			volume_entity._attr_available = is_available
-			mute_entity._attr_available = is_available
-			lock_button._attr_available = is_available
-			enforce_lock_entity._attr_available = is_available
-			active_window_entity._attr_available = is_available
-			session_state_entity._attr_available = is_available
-			
-			# Update state of all entities
-			entity.async_write_ha_state()
-			volume_entity.async_write_ha_state()
-			mute_entity.async_write_ha_state()
-			lock_button.async_write_ha_state()
-			enforce_lock_entity.async_write_ha_state()
-			active_window_entity.async_write_ha_state()
-			session_state_entity.async_write_ha_state()
-
-	# Subscribe to MQTT topics with timeout
-	try:
-		_LOGGER.warning("Subscribing to MQTT topics...")
-		subscriptions = [
-			# HASS.Agent sensor topics
-			await asyncio.wait_for(mqtt.async_subscribe(hass, activewindow_topic, message_received), timeout=10),
-			await asyncio.wait_for(mqtt.async_subscribe(hass, sessionstate_topic, message_received), timeout=10),
-			await asyncio.wait_for(mqtt.async_subscribe(hass, currentvolume_topic, message_received), timeout=10),
-			await asyncio.wait_for(mqtt.async_subscribe(hass, availability_topic, message_received), timeout=10),
-		]
-		_LOGGER.warning("Successfully subscribed to all MQTT topics")
-	except asyncio.TimeoutError as e:
-		_LOGGER.error("Timeout while subscribing to MQTT topics: %s", e)
-		raise HomeAssistantError("Failed to subscribe to MQTT topics due to timeout")
-
-	# Store unsubscribe callbacks
-	hass.data.setdefault(DOMAIN, {})
-	if config_entry.entry_id not in hass.data[DOMAIN]:
-		hass.data[DOMAIN][config_entry.entry_id] = {}
-	
-	hass.data[DOMAIN][config_entry.entry_id]["unsubscribes"] = subscriptions
+			ctx.writer.mark_origin(received)
+			await handler(payload)
+			ctx.metrics.record_latency(time.monotonic() - received)
+		return message_received
+
+	# HASS.Agent sensor handlers
+	async def handle_active_window(payload):
+		_LOGGER.warning("Active window update from HASS.Agent: %s", payload)
+		await entity.set_active_window(payload)
+		await active_window_entity.async_update_state()
+
+	async def handle_session_state(payload):
+		_LOGGER.warning("Session state update from HASS.Agent: %s", payload)
+		entity._commands.observed(COMMAND_LOCK, payload)
+		await entity.set_session_state(payload)
+		await session_state_entity.async_update_state()
+
+	async def handle_current_volume(payload):
+		try:
+			_LOGGER.warning("Current volume update from HASS.Agent: %s", payload)
+			volume = float(payload) / 100.0  # Convert percentage to 0-1 range
+			entity._commands.observed(COMMAND_VOLUME, payload)
+			# Reported by HASS.Agent, so only mirror it - do not send it back as a command
+			await entity.async_update_volume_level(volume)
+			await volume_entity.async_update_state()
+		except ValueError as e:
+			_LOGGER.error("Invalid volume value received: %s, error: %s", payload, e)
+
+	async def handle_availability(payload):
+		_LOGGER.warning("Availability update from HASS.Agent: %s", payload)
+		# Update availability of all entities
+		is_available = payload.lower() == "online"
+		refresh.set_available(device_name_case, is_available)
+		entity.set_available(is_available)
+
+	# Route this device's topics through the shared wildcard subscription
+	# instead of subscribing to each topic per device
+	# (subscription failures are reported per topic by the router and do not
+	# abort the setup of this entry)
+	_LOGGER.warning("Registering %s with the shared MQTT router...", device_name_case)
+	unregister = await async_get_router(hass).async_register_device(device_name_case, {
+		"activewindow": route(handle_active_window, "active window"),
+		"sessionstate": route(handle_session_state, "session state"),
+		"currentvolume": route(handle_current_volume, "volume"),
+		SUFFIX_AVAILABILITY: route(handle_availability, "availability", sensor=False),
+	})
+	# Refresh the sensors in the background if this computer goes quiet
+	untrack = refresh.track(device_name_case, entity.request_sensor_update)
+
+	# Released when the entry is unloaded; everything owned by the entities
+	# themselves is released in their async_will_remove_from_hass
+	config_entry.async_on_unload(unregister)
+	config_entry.async_on_unload(untrack)
 	
 	_LOGGER.debug("Finished setup for config entry: %s", config_entry.entry_id)
 	return True
 
-class ComputerDevice(Entity):
-	"""Representation of a Computer device."""
+class ComputerDevice(IndexedEntity, RestoreEntity):
+	"""Representation of a Computer device.
+
+	The last state is restored on startup. The sub-entities only present
+	values held here, so they are restored along with it.
+	"""
 
-	def __init__(self, hass, entry_id, config):
+	def __init__(self, hass, ctx, config):
 		"""Initialize the Computer device."""
 		self.hass = hass
-		self._entry_id = entry_id
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
 		self._device_name = config[CONF_DEVICE_NAME]
 		self._power_on_action = config[CONF_POWER_ON_ACTION]
 		self._power_off_action = config[CONF_POWER_OFF_ACTION]
-		self._enforce_lock = False
+		self._enforce = EnforceLock(hass, self._async_send_lock_command, ctx.metrics, self._device_name)
+		self._commands = CommandTracker(hass, ctx.metrics, self._entry_id, self._device_name)
+		self._flights = SingleFlight(hass, ctx.metrics)
+		# Last session state reported by HASS.Agent (the attribute is also set locally)
+		self._reported_session = None
+		self._confirmed_commands = config.get(CONF_CONFIRMED_COMMANDS, DEFAULT_CONFIRMED_COMMANDS)
+		# Commands given while HASS.Agent reports the computer offline
+		self._offline = False
+		self._outbox = CommandOutbox(
+			hass,
+			self.async_publish,
+			config.get(CONF_OFFLINE_QUEUE_TTL, DEFAULT_OFFLINE_QUEUE_TTL),
+			self._device_name
+		)
 		self._muted = False
 		self._volume_level = 0.5
-		self._attr_unique_id = f"computer_{self._device_name.lower()}_{entry_id}"
+		self._metrics_unsub = None
+		self._volume_throttle = CommandThrottle(
+			hass,
+			self._async_send_volume_command,
+			config.get(CONF_VOLUME_DEBOUNCE, DEFAULT_VOLUME_DEBOUNCE),
+			config.get(CONF_VOLUME_MAX_RATE, DEFAULT_VOLUME_MAX_RATE),
+			name="volume command"
+		)
+		self._state_publisher = StatePublisher(
+			self.async_publish,
+			ctx.echo,
+			config.get(CONF_RETAIN_STATE, DEFAULT_RETAIN_STATE)
+		)
+		self._resync_interval = config.get(CONF_RESYNC_INTERVAL, DEFAULT_RESYNC_INTERVAL)
+		self._resync_unsub = None
+		self._combined_state = config.get(CONF_COMBINED_STATE, DEFAULT_COMBINED_STATE)
+		self._legacy_topics = config.get(CONF_LEGACY_TOPICS, DEFAULT_LEGACY_TOPICS)
+		self._restore_max_age = config.get(CONF_RESTORE_MAX_AGE, DEFAULT_RESTORE_MAX_AGE)
+		# Wall clock time of the last message from HASS.Agent
+		self._last_seen = None
+		self._heartbeat_timeout = config.get(CONF_HEARTBEAT_TIMEOUT, DEFAULT_HEARTBEAT_TIMEOUT)
+		# Wall clock time heartbeat checking started, for computers never heard from
+		self._heartbeat_started = None
+		self._heartbeat_lost = False
+		self._attr_unique_id = f"computer_{self._device_name.lower()}_{self._entry_id}"
 		self._attr_name = f"Computer {self._device_name}"
 		self._attr_entity_category = None  # Primary entity, not a configuration entity
 		self._state = STATE_ON
@@ -572,7 +334,7 @@ class ComputerDevice(Entity):
 			ATTR_VOLUME_LEVEL: self._volume_level,
 			ATTR_ACTIVE_WINDOW: "Desktop",
 			ATTR_SESSION_STATE: "unlocked",
-			"enforce_lock": self._enforce_lock,
+			"enforce_lock": False,
 			"muted": self._muted
 		}
 		self._attr_device_info = {
@@ -583,42 +345,158 @@ class ComputerDevice(Entity):
 		}
 		# Make sure the entity_id follows the format domain.object_id
 		self.entity_id = f"computer.{self._device_name.lower()}"
+		self._ctx.logbook.entity_id = self.entity_id
 
 	async def async_added_to_hass(self):
 		"""Run when entity is added to Home Assistant."""
 		await super().async_added_to_hass()
-		self._setup_state_tracking()
-		_LOGGER.debug("State tracking set up for entity %s", self.entity_id)
-		
-		# Request initial sensor data from HASS.Agent
-		await self.request_sensor_update()
-
-	def _setup_state_tracking(self):
-		"""Set up tracking for session state changes."""
-		async_track_state_change_event(
-			self.hass,
-			[self.entity_id],
-			self._handle_state_change
-		)
 
-	async def _handle_state_change(self, event):
-		"""Handle state changes to enforce lock."""
-		new_state = event.data.get("new_state")
-		if new_state is None:
+		# Refresh the metric sensors on a fixed interval, not on every message
+		if self._metrics_unsub is None:
+			self._metrics_unsub = async_track_time_interval(
+				self.hass, self._async_refresh_metric_sensors, METRICS_REFRESH_INTERVAL
+			)
+		self._schedule_resync()
+		self._heartbeat_started = time.time()
+		self._schedule_heartbeat(self._heartbeat_timeout)
+		
+		# Request initial sensor data from HASS.Agent, unless the restored
+		# state is recent enough to be trusted. The shared scheduler spreads
+		# these requests out when many computers start at once.
+		if not await self._async_restore_state():
+			async_get_refresh_scheduler(self.hass).request(self._device_name, self.request_sensor_update)
+
+	async def _async_restore_state(self):
+		"""Restore the last known state.
+
+		Returns True if the restored data is no older than the restore_max_age option.
+		"""
+		last_state = await self.async_get_last_state()
+		if last_state is None:
+			return False
+
+		if last_state.state in (STATE_ON, STATE_OFF):
+			self._state = last_state.state
+		attributes = last_state.attributes
+		if isinstance(attributes.get(ATTR_VOLUME_LEVEL), (int, float)):
+			self._volume_level = attributes[ATTR_VOLUME_LEVEL]
+		self._muted = bool(attributes.get("muted", self._muted))
+		if attributes.get("enforce_lock"):
+			# The next sessionstate message decides whether to relock
+			self._enforce.enable(None)
+		for attribute in (ATTR_ACTIVE_WINDOW, ATTR_SESSION_STATE):
+			if attributes.get(attribute) is not None:
+				self._attributes[attribute] = attributes[attribute]
+		# The sub-entities are added after this entity and write the
+		# restored values themselves when they are
+		self._ctx.writer.schedule(self)
+
+		extra_data = await self.async_get_last_extra_data()
+		last_seen = extra_data.as_dict().get("last_seen") if extra_data else None
+		if last_seen is None:
+			_LOGGER.debug("Restored state of %s, but not when it was last seen", self.entity_id)
+			return False
+		self._last_seen = last_seen
+		age = time.time() - last_seen
+		_LOGGER.debug("Restored state of %s, last seen %.0f s ago", self.entity_id, age)
+		return age <= self._restore_max_age
+
+	@property
+	def extra_restore_state_data(self):
+		"""Return data restored on startup alongside the state."""
+		return RestoredExtraData({"last_seen": self._last_seen})
+
+	async def async_will_remove_from_hass(self):
+		"""Run when entity will be removed from Home Assistant."""
+		if self._metrics_unsub is not None:
+			self._metrics_unsub()
+			self._metrics_unsub = None
+		if self._resync_unsub is not None:
+			self._resync_unsub()
+			self._resync_unsub = None
+		async_get_refresh_scheduler(self.hass).cancel(self._device_name)
+		async_get_timer_wheel(self.hass).cancel(self._entry_id)
+		self._volume_throttle.cancel()
+		self._enforce.cancel()
+		self._commands.cancel()
+		self._outbox.clear()
+		self._ctx.writer.cancel()
+		self._ctx.logbook.cancel()
+		await super().async_will_remove_from_hass()
+
+	def set_available(self, available):
+		"""Set the availability of the computer and its sub-entities."""
+		entities = [
+			entity for role, entity in self._ctx.entities.items() if not role.startswith("metric_")
+		]
+		for entity in entities:
+			entity._attr_available = available
+		# Written once, on the next loop tick
+		self._ctx.writer.schedule(*entities)
+		self._offline = not available
+		if available and len(self._outbox):
+			self.hass.async_create_task(self._outbox.async_flush())
+
+	def heartbeat(self):
+		"""Note that a message from HASS.Agent arrived."""
+		self._last_seen = time.time()
+		if self._heartbeat_lost:
+			_LOGGER.info("Computer %s is sending updates again", self._device_name)
+			self._heartbeat_lost = False
+			self.set_available(True)
+			self._schedule_heartbeat(self._heartbeat_timeout)
+
+	def _schedule_heartbeat(self, delay):
+		"""(Re)arm the heartbeat timeout on the shared timer wheel, if enabled."""
+		wheel = async_get_timer_wheel(self.hass)
+		if self._heartbeat_timeout and not self._heartbeat_lost:
+			wheel.schedule(self._entry_id, delay, self._heartbeat_check)
+		else:
+			wheel.cancel(self._entry_id)
+
+	def _heartbeat_check(self):
+		"""Mark the computer unavailable if HASS.Agent has gone silent.
+
+		Messages only update a timestamp; the timer is re-armed here for the
+		remaining time, so a chatty computer costs one timer per timeout.
+		"""
+		last = self._last_seen or self._heartbeat_started
+		remaining = last + self._heartbeat_timeout - time.time()
+		if remaining > 0:
+			self._schedule_heartbeat(remaining)
 			return
+		_LOGGER.warning(
+			"No message from Computer %s for %d s, marking it unavailable",
+			self._device_name, self._heartbeat_timeout
+		)
+		self._heartbeat_lost = True
+		self.set_available(False)
 
-		# Check if session state changed to unlocked while enforce_lock is active
-		session_state = new_state.attributes.get(ATTR_SESSION_STATE, "unlocked")
-		if self._enforce_lock and session_state == "unlocked":
-			_LOGGER.info("Enforced lock active: Re-locking Computer %s", self._device_name)
-			self._attributes[ATTR_SESSION_STATE] = "locked"
-			await self._publish_state()
-			self.async_write_ha_state()
-			
-			# Update session state sensor if it exists
-			entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-			if isinstance(entities, dict) and "session_state" in entities:
-				await entities["session_state"].async_update_state()
+	def _schedule_resync(self):
+		"""(Re)start the periodic full state republish, if enabled."""
+		if self._resync_unsub is not None:
+			self._resync_unsub()
+			self._resync_unsub = None
+		if self._resync_interval:
+			self._resync_unsub = async_track_time_interval(
+				self.hass, self._async_resync_state, timedelta(seconds=self._resync_interval)
+			)
+
+	async def _async_resync_state(self, now=None):
+		"""Republish the complete state, changed or not."""
+		self._state_publisher.invalidate()
+		await self._publish_state()
+
+	async def _async_refresh_metric_sensors(self, now=None):
+		"""Write the state of this device's metric sensors."""
+		self._ctx.writer.schedule(*(
+			sensor for role, sensor in self._ctx.entities.items() if role.startswith("metric_")
+		))
+
+	@property
+	def _enforce_lock(self):
+		"""Return True if enforce lock is on."""
+		return self._enforce.enabled
 
 	@property
 	def state(self):
@@ -649,15 +527,13 @@ class ComputerDevice(Entity):
 			_LOGGER.info("Enforced lock active: Locking Computer %s after turn on", self._device_name)
 			self._attributes[ATTR_SESSION_STATE] = "locked"
 
-		await self._publish_state()
-		self.async_write_ha_state()
+		await self._publish_state(LANE_POWER)
+		self._ctx.writer.schedule(self)
 		
-		# Update sub-entities if they exist
-		entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-		if isinstance(entities, dict):
-			for entity_type, entity in entities.items():
-				if entity_type != "main" and hasattr(entity, "async_update_state"):
-					await entity.async_update_state()
+		# Update sub-entities
+		for entity_type, entity in self._ctx.entities.items():
+			if entity_type != "main" and hasattr(entity, "async_update_state"):
+				await entity.async_update_state()
 
 	async def async_turn_off(self, **kwargs):
 		"""Turn the Computer off based on configured action."""
@@ -674,123 +550,190 @@ class ComputerDevice(Entity):
 			self._state = STATE_OFF
 			self._attributes[ATTR_SESSION_STATE] = "locked"
 
-		await self._publish_state()
-		self.async_write_ha_state()
+		await self._publish_state(LANE_POWER)
+		self._ctx.writer.schedule(self)
 		
-		# Update sub-entities if they exist
-		entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-		if isinstance(entities, dict):
-			for entity_type, entity in entities.items():
-				if entity_type != "main" and hasattr(entity, "async_update_state"):
-					await entity.async_update_state()
+		# Update sub-entities
+		for entity_type, entity in self._ctx.entities.items():
+			if entity_type != "main" and hasattr(entity, "async_update_state"):
+				await entity.async_update_state()
+
+	def async_apply_options(self, config):
+		"""Apply changed integration options to the running device."""
+		self._volume_throttle.configure(
+			config.get(CONF_VOLUME_DEBOUNCE, DEFAULT_VOLUME_DEBOUNCE),
+			config.get(CONF_VOLUME_MAX_RATE, DEFAULT_VOLUME_MAX_RATE)
+		)
+		self._ctx.logbook.configure(config.get(CONF_LOGBOOK_WINDOW, DEFAULT_LOGBOOK_WINDOW))
+		self._state_publisher.configure(config.get(CONF_RETAIN_STATE, DEFAULT_RETAIN_STATE))
+		self._legacy_topics = config.get(CONF_LEGACY_TOPICS, DEFAULT_LEGACY_TOPICS)
+		self._restore_max_age = config.get(CONF_RESTORE_MAX_AGE, DEFAULT_RESTORE_MAX_AGE)
+		self._confirmed_commands = config.get(CONF_CONFIRMED_COMMANDS, DEFAULT_CONFIRMED_COMMANDS)
+		self._outbox.configure(config.get(CONF_OFFLINE_QUEUE_TTL, DEFAULT_OFFLINE_QUEUE_TTL))
+		heartbeat_timeout = config.get(CONF_HEARTBEAT_TIMEOUT, DEFAULT_HEARTBEAT_TIMEOUT)
+		if heartbeat_timeout != self._heartbeat_timeout:
+			self._heartbeat_timeout = heartbeat_timeout
+			if self._heartbeat_started is not None:
+				if self._heartbeat_lost and not heartbeat_timeout:
+					self._heartbeat_lost = False
+					self.set_available(True)
+				self._schedule_heartbeat(heartbeat_timeout)
+		combined_state = config.get(CONF_COMBINED_STATE, DEFAULT_COMBINED_STATE)
+		if combined_state != self._combined_state:
+			self._combined_state = combined_state
+			self._state_publisher.forget(self._ctx.topics.state)
+			if not combined_state:
+				# Clear the retained document so consumers do not act on a stale copy
+				self.hass.async_create_task(self.async_publish(self._ctx.topics.state, "", retain=True))
+		resync_interval = config.get(CONF_RESYNC_INTERVAL, DEFAULT_RESYNC_INTERVAL)
+		if resync_interval != self._resync_interval:
+			self._resync_interval = resync_interval
+			if self.hass is not None and self.entity_id is not None:
+				self._schedule_resync()
 
 	async def async_set_volume_level(self, volume):
 		"""Set volume level."""
 		_LOGGER.info("Setting volume level to %f via MQTT", volume)
+		if not self._confirmed_commands:
+			# Optimistic: show the new level now. In confirmed mode it is shown
+			# once HASS.Agent reports it on currentvolume.
+			await self.async_update_volume_level(volume)
+
+		# Send command to HASS.Agent. The throttle only sends the latest
+		# target of a burst (e.g. knob sweep).
+		self._volume_throttle.submit(volume)
+
+	async def _async_send_volume_command(self, volume):
+		"""Publish a set volume command and wait for HASS.Agent to report the level."""
+		percent = round(volume * 100)
+		if not self._offline:
+			self._commands.sent(
+				COMMAND_VOLUME, volume_confirmed_by(percent),
+				lambda: self._async_publish_volume(percent)
+			)
+		await self._async_publish_volume(percent)
+
+	async def _async_publish_volume(self, percent):
+		"""Publish a set volume command to HASS.Agent."""
+		topic = self._ctx.topics.setvolume
+		try:
+			# Payload should be the volume value
+			await self.async_publish_command(topic, str(percent))
+			_LOGGER.info("Published volume command to HASS.Agent topic: %s with value %s", topic, percent)
+		except Exception as e:
+			_LOGGER.error("Failed to publish volume command: %s", e)
+
+	async def async_update_volume_level(self, volume):
+		"""Update the volume level without sending a command to HASS.Agent."""
 		self._volume_level = volume
 		self._attributes[ATTR_VOLUME_LEVEL] = volume
 		self._attributes["muted"] = False  # Unmute when volume is changed
 		self._muted = False
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 		await self._publish_state()
 		
-		# Send command to HASS.Agent
-		device_name_case = self._device_name  # Preserve case
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_setvolume/set"
-		try:
-			# Payload should be the volume value
-			await mqtt.async_publish(self.hass, topic, str(int(volume * 100)))
-			_LOGGER.info("Published volume command to HASS.Agent topic: %s with value %s", topic, str(int(volume * 100)))
-		except Exception as e:
-			_LOGGER.error("Failed to publish volume command: %s", e)
-		
 		# Update volume and mute entities if they exist
-		entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-		if isinstance(entities, dict):
-			if "volume" in entities:
-				await entities["volume"].async_update_state()
-			if "mute" in entities:
-				await entities["mute"].async_update_state()
+		entities = self._ctx.entities
+		if "volume" in entities:
+			await entities["volume"].async_update_state()
+		if "mute" in entities:
+			await entities["mute"].async_update_state()
 
 	async def async_mute(self, mute):
 		"""Mute or unmute Computer."""
 		self._muted = mute
 		self._attributes["muted"] = mute
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 		await self._publish_state()
 		
 		# Update mute entity if it exists
-		entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-		if isinstance(entities, dict) and "mute" in entities:
-			await entities["mute"].async_update_state()
+		if "mute" in self._ctx.entities:
+			await self._ctx.entities["mute"].async_update_state()
+
+	async def async_set_mute(self, mute):
+		"""Mute or unmute Computer through HASS.Agent.
+
+		Concurrent requests for the same state are merged into one.
+		"""
+		await self._flights.async_run(COMMAND_MUTE, mute, lambda: self._async_apply_mute(mute))
 
 	async def async_toggle_mute(self):
-		"""Toggle mute state."""
+		"""Toggle mute state; toggles arriving together are carried out once."""
 		_LOGGER.info("Toggling mute state via MQTT")
-		await self.async_mute(not self._muted)
-		
+		mute = not self._muted
+		await self._flights.async_run(
+			COMMAND_MUTE, mute, lambda: self._async_apply_mute(mute), join_any=True
+		)
+
+	async def _async_apply_mute(self, mute):
+		"""Press the HASS.Agent mute toggle if the computer is not muted as desired."""
+		if mute == self._muted:
+			self._ctx.metrics.record_command_skipped()
+			_LOGGER.debug("Computer %s is already %s", self._device_name, "muted" if mute else "unmuted")
+			return
+
 		# Send command to HASS.Agent
-		device_name_case = self._device_name  # Preserve case
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_mute/set"
+		topic = self._ctx.topics.mute
 		try:
-			# Any payload will trigger the button press
-			await mqtt.async_publish(self.hass, topic, "PRESS")
+			# Any payload will trigger the button press. The flight lasts until
+			# the press has gone out, so toggles arriving meanwhile join it.
+			await self.async_publish_command(topic, "PRESS", wait=True)
 			_LOGGER.info("Published mute command to HASS.Agent topic: %s", topic)
 		except Exception as e:
 			_LOGGER.error("Failed to publish mute command: %s", e)
+		await self.async_mute(mute)
 
 	async def async_toggle_enforce_lock(self):
-		"""Toggle enforce lock."""
+		"""Toggle enforce lock.
+
+		Returns the task sending the lock command if turning enforce lock on
+		started relocking an unlocked computer, else None.
+		"""
 		_LOGGER.info("Toggling enforce lock state via MQTT")
-		self._enforce_lock = not self._enforce_lock
+		relock = None
+		if self._enforce.enabled:
+			self._enforce.disable()
+		else:
+			# Sends the lock command to HASS.Agent if the session is unlocked
+			relock = self._enforce.enable(self._attributes[ATTR_SESSION_STATE])
 		self._attributes["enforce_lock"] = self._enforce_lock
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 		await self._publish_state()
 		
-		# Send command to HASS.Agent
-		device_name_case = self._device_name  # Preserve case
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_lock/set"
-		try:
-			# Any payload will trigger the button press
-			await mqtt.async_publish(self.hass, topic, "PRESS")
-			_LOGGER.info("Published lock command to HASS.Agent topic: %s", topic)
-		except Exception as e:
-			_LOGGER.error("Failed to publish lock command: %s", e)
-		
 		# Update enforce_lock entity if it exists
-		entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-		if isinstance(entities, dict):
-			if "enforce_lock" in entities:
-				await entities["enforce_lock"].async_update_state()
-			if "lock" in entities:
-				await entities["lock"].async_update_state()
-			if "session_state" in entities:
-				await entities["session_state"].async_update_state()
+		entities = self._ctx.entities
+		if "enforce_lock" in entities:
+			await entities["enforce_lock"].async_update_state()
+		if "lock" in entities:
+			await entities["lock"].async_update_state()
+		if "session_state" in entities:
+			await entities["session_state"].async_update_state()
+		return relock
 				
 	async def set_active_window(self, window_name):
 		"""Set active window."""
 		self._attributes[ATTR_ACTIVE_WINDOW] = window_name
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 		await self._publish_state()
 		
 		# Update active window entity if it exists
-		entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-		if isinstance(entities, dict) and "active_window" in entities:
-			await entities["active_window"].async_update_state()
+		if "active_window" in self._ctx.entities:
+			await self._ctx.entities["active_window"].async_update_state()
 			
 	async def set_session_state(self, state):
-		"""Set session state."""
+		"""Set the session state reported by HASS.Agent."""
 		self._attributes[ATTR_SESSION_STATE] = state
-		self.async_write_ha_state()
+		self._reported_session = str(state).lower()
+		self._enforce.session_state_changed(state)
+		self._ctx.writer.schedule(self)
 		await self._publish_state()
 		
 		# Update session state entity if it exists
-		entities = self.hass.data.get(DOMAIN, {}).get("entities", {}).get(self._entry_id, {})
-		if isinstance(entities, dict) and "session_state" in entities:
-			await entities["session_state"].async_update_state()
+		if "session_state" in self._ctx.entities:
+			await self._ctx.entities["session_state"].async_update_state()
 
-	async def _publish_state(self):
-		"""Publish the current state to the MQTT update topic."""
+	async def _publish_state(self, lane=LANE_STATE):
+		"""Publish what changed in the current state to the MQTT topics."""
 		state = self._state
 		payload = {
 			"entity_id": f"Computer.{self._device_name}",
@@ -799,62 +742,125 @@ class ComputerDevice(Entity):
 			ATTR_ACTIVE_WINDOW: self._attributes[ATTR_ACTIVE_WINDOW],
 			ATTR_SESSION_STATE: self._attributes[ATTR_SESSION_STATE]
 		}
-		topic = f"{MQTT_BASE_TOPIC}/Computer/Computer.{self._device_name}/update"
-		try:
-			payload_str = json.dumps(payload)
-			await mqtt.async_publish(self.hass, topic, payload_str)
-			
-			# Also publish to HASS.Agent specific topics
-			device_name_case = self._device_name  # Preserve case for HASS.Agent topics
-			
-			# Publish volume to HASS.Agent volume topic
-			volume_percent = int(self._attributes[ATTR_VOLUME_LEVEL] * 100)
-			await mqtt.async_publish(
-				self.hass, 
-				f"{MQTT_BASE_TOPIC}/sensor/{device_name_case}/{device_name_case}_currentvolume/state", 
-				str(volume_percent)
-			)
-			
-			# Publish active window to HASS.Agent active window topic
-			await mqtt.async_publish(
-				self.hass, 
-				f"{MQTT_BASE_TOPIC}/sensor/{device_name_case}/{device_name_case}_activewindow/state", 
-				self._attributes[ATTR_ACTIVE_WINDOW]
+		topics = self._ctx.topics
+		publisher = self._state_publisher
+		if self._combined_state:
+			document = build_state_document(
+				state,
+				self._attributes[ATTR_VOLUME_LEVEL],
+				self._attributes[ATTR_ACTIVE_WINDOW],
+				self._attributes[ATTR_SESSION_STATE],
+				self._muted,
+				self._enforce_lock
 			)
-			
-			# Publish session state to HASS.Agent session state topic
-			await mqtt.async_publish(
-				self.hass, 
-				f"{MQTT_BASE_TOPIC}/sensor/{device_name_case}/{device_name_case}_sessionstate/state", 
-				self._attributes[ATTR_SESSION_STATE]
-			)
-			
-			_LOGGER.debug("Published state updates to both Computer and HASS.Agent MQTT topics")
+			try:
+				await publisher.async_publish_snapshot(topics.state, document, lane)
+			except (TypeError, ValueError) as e:
+				_LOGGER.error("Failed to serialize state to JSON for %s: %s", topics.state, e)
+
+		if not self._legacy_topics:
+			return
+		try:
+			await publisher.async_publish_document(topics.update, payload, ("entity_id",), lane)
 		except (TypeError, ValueError) as e:
-			_LOGGER.error("Failed to serialize state to JSON for %s: %s", topic, e)
+			_LOGGER.error("Failed to serialize state to JSON for %s: %s", topics.update, e)
+			return
+
+		# Also publish to HASS.Agent specific topics (skipped when unchanged,
+		# including values HASS.Agent itself just reported)
+		volume_percent = round(self._attributes[ATTR_VOLUME_LEVEL] * 100)
+		await publisher.async_publish_value(topics.currentvolume, str(volume_percent), lane)
+		await publisher.async_publish_value(topics.activewindow, self._attributes[ATTR_ACTIVE_WINDOW], lane)
+		await publisher.async_publish_value(topics.sessionstate, self._attributes[ATTR_SESSION_STATE], lane)
+
+	async def async_lock(self):
+		"""Lock the computer through HASS.Agent.
+
+		Nothing is sent if HASS.Agent reports the session locked or a lock
+		command is still awaiting confirmation, and concurrent requests are
+		merged into one.
+		"""
+		await self._flights.async_run(COMMAND_LOCK, True, self._async_apply_lock)
+
+	async def _async_apply_lock(self):
+		"""Send the lock command unless the computer is locked or being locked."""
+		if self._reported_session == SESSION_LOCKED or self._commands.is_pending(COMMAND_LOCK):
+			self._ctx.metrics.record_command_skipped()
+			_LOGGER.debug("Computer %s is already locked or being locked", self._device_name)
+			return
+		await self._async_send_lock_command(retry=True)
+
+	async def _async_send_lock_command(self, retry=False):
+		"""Publish a lock command and wait for HASS.Agent to report the session locked.
+
+		Enforce lock repeats the command itself, so only a lock requested
+		by the user is retried here.
+		"""
+		if not self._offline:
+			self._commands.sent(COMMAND_LOCK, session_locked, self._async_publish_lock if retry else None)
+		await self._async_publish_lock()
+
+	async def _async_publish_lock(self):
+		"""Publish a lock command to HASS.Agent."""
+		topic = self._ctx.topics.lock
+		try:
+			# Any payload will trigger the button press
+			await self.async_publish_command(topic, "PRESS", LANE_SECURITY)
+			_LOGGER.info("Published lock command to HASS.Agent topic: %s", topic)
+		except Exception as e:
+			_LOGGER.error("Failed to publish lock command: %s", e)
+
+	async def async_publish(self, topic, payload, retain=False, lane=LANE_STATE, wait=False):
+		"""Publish an MQTT message for this device.
+
+		The message is queued on an outbound priority lane shared by all
+		computers; with wait this returns once it has gone out. If the lane
+		overflows before it is sent, the state publisher forgets the topic
+		so it is republished in full.
+		"""
+		self._ctx.metrics.record_outbound()
+		sent = async_get_outbound(self.hass).publish(
+			topic, payload, retain, lane, self._state_publisher.forget, wait
+		)
+		if sent is not None:
+			await sent
+
+	async def async_publish_command(self, topic, payload, lane=LANE_COMMAND, wait=False):
+		"""Publish a command to HASS.Agent for this device.
+
+		While the computer is offline the command is held in the outbox
+		instead and sent once it is back online.
+		"""
+		if self._offline and self._outbox.hold(topic, payload, lane, toggle=topic == self._ctx.topics.mute):
+			return
+		started = SERVICE_CALL_STARTED.get()
+		if started:
+			# First command caused by a computer.* service call
+			self._ctx.metrics.service_to_publish.record(time.monotonic() - started.pop())
+		await self.async_publish(topic, payload, lane=lane, wait=wait)
 
 	async def request_sensor_update(self):
 		"""Request HASS.Agent to publish all sensor data."""
 		_LOGGER.warning("Requesting sensor update from HASS.Agent")
 		
 		# Send command to HASS.Agent's publishallsensors button
-		device_name_case = self._device_name  # Preserve case exactly as it appears in HASS.Agent
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_publishallsensors/set"
+		topic = self._ctx.topics.publishallsensors
 		try:
 			# Any payload will trigger the button press
 			_LOGGER.warning("Publishing sensor update request to topic: %s", topic)
-			await mqtt.async_publish(self.hass, topic, "PRESS")
+			await self.async_publish_command(topic, "PRESS")
 			_LOGGER.warning("Published sensor update request to HASS.Agent topic: %s", topic)
 		except Exception as e:
 			_LOGGER.error("Failed to publish sensor update request: %s", e)
 
-class ComputerVolumeEntity(NumberEntity):
+class ComputerVolumeEntity(IndexedEntity, NumberEntity):
 	"""Volume control entity for Computer."""
 	
-	def __init__(self, hass, entry_id, config, parent_entity):
+	def __init__(self, hass, ctx, config, parent_entity):
 		"""Initialize volume entity."""
 		self.hass = hass
-		self._entry_id = entry_id
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
 		self._device_name = config[CONF_DEVICE_NAME]
 		self.parent = parent_entity
 		self._attr_unique_id = f"computer_{self._device_name.lower()}_volume"
@@ -884,49 +890,34 @@ class ComputerVolumeEntity(NumberEntity):
 		"""Return current volume level."""
 		return self.parent._volume_level
 		
+	@timed_service_call
 	async def async_set_native_value(self, value):
 		"""Set new volume level."""
 		_LOGGER.warning("Volume being set to %f via %s", value, self.entity_id)
 		
-		# Log this action to the Home Assistant logbook
-		from homeassistant.components import logbook
-		await logbook.async_log_entry(
-			self.hass,
+		# Log this action to the Home Assistant logbook (user actions are never aggregated)
+		self._ctx.logbook.log_action(
 			"Computer Volume",
-			f"Set volume to {int(value * 100)}% for {self.parent._device_name}",
-			entity_id=self.entity_id,
-			domain="number"
+			f"Set volume to {round(value * 100)}% for {self.parent._device_name}",
+			self.entity_id,
+			"number"
 		)
 		
-		# Send MQTT command directly
-		device_name_case = self._device_name  # Preserve case exactly as it appears in HASS.Agent
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_setvolume/set"
-		
-		try:
-			# Log the exact MQTT command being sent
-			_LOGGER.warning("Sending volume set command to MQTT topic: %s with value %s", 
-				topic, str(int(value * 100)))
-			
-			# Payload should be the volume value
-			await mqtt.async_publish(self.hass, topic, str(int(value * 100)))
-			_LOGGER.warning("Successfully published volume command to HASS.Agent")
-		except Exception as e:
-			_LOGGER.error("Failed to publish volume command to MQTT: %s", e)
-		
-		# Also update through parent entity
+		# Update through the parent entity, which sends the (throttled) command
 		await self.parent.async_set_volume_level(value)
 		
 	async def async_update_state(self):
 		"""Update the entity state."""
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 
-class ComputerMuteEntity(SwitchEntity):
+class ComputerMuteEntity(IndexedEntity, SwitchEntity):
 	"""Mute control entity for Computer."""
 	
-	def __init__(self, hass, entry_id, config, parent_entity):
+	def __init__(self, hass, ctx, config, parent_entity):
 		"""Initialize mute entity."""
 		self.hass = hass
-		self._entry_id = entry_id
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
 		self._device_name = config[CONF_DEVICE_NAME]
 		self.parent = parent_entity
 		self._attr_unique_id = f"computer_{self._device_name.lower()}_mute"
@@ -951,79 +942,50 @@ class ComputerMuteEntity(SwitchEntity):
 		"""Return true if muted."""
 		return self.parent._muted
 		
+	@timed_service_call
 	async def async_turn_on(self, **kwargs):
 		"""Turn on mute."""
 		_LOGGER.warning("Mute turn ON for %s - sending to MQTT", self.entity_id)
 		
-		# Log this action to the Home Assistant logbook
-		from homeassistant.components import logbook
-		await logbook.async_log_entry(
-			self.hass,
+		# Log this action to the Home Assistant logbook (user actions are never aggregated)
+		self._ctx.logbook.log_action(
 			"Computer Mute",
 			f"Set mute ON for {self.parent._device_name} via MQTT",
-			entity_id=self.entity_id,
-			domain="switch"
+			self.entity_id,
+			"switch"
 		)
 		
-		# Send MQTT command directly
-		device_name_case = self._device_name  # Preserve case exactly as it appears in HASS.Agent
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_mute/set"
-		
-		try:
-			# Log the exact MQTT command being sent
-			_LOGGER.warning("Sending mute ON command to MQTT topic: %s", topic)
-			
-			# Any payload will trigger the button press
-			await mqtt.async_publish(self.hass, topic, "PRESS")
-			_LOGGER.warning("Successfully published mute command to HASS.Agent")
-		except Exception as e:
-			_LOGGER.error("Failed to publish mute command to MQTT: %s", e)
-			
-		# Also update through parent entity
-		await self.parent.async_mute(True)
+		# Presses the HASS.Agent mute toggle only if not muted already
+		await self.parent.async_set_mute(True)
 		
+	@timed_service_call
 	async def async_turn_off(self, **kwargs):
 		"""Turn off mute."""
 		_LOGGER.warning("Mute turn OFF for %s - sending to MQTT", self.entity_id)
 		
-		# Log this action to the Home Assistant logbook
-		from homeassistant.components import logbook
-		await logbook.async_log_entry(
-			self.hass,
+		# Log this action to the Home Assistant logbook (user actions are never aggregated)
+		self._ctx.logbook.log_action(
 			"Computer Mute",
 			f"Set mute OFF for {self.parent._device_name} via MQTT",
-			entity_id=self.entity_id,
-			domain="switch"
+			self.entity_id,
+			"switch"
 		)
 		
-		# Send MQTT command directly
-		device_name_case = self._device_name  # Preserve case exactly as it appears in HASS.Agent
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_mute/set"
-		
-		try:
-			# Log the exact MQTT command being sent
-			_LOGGER.warning("Sending mute OFF command to MQTT topic: %s", topic)
-			
-			# Any payload will trigger the button press
-			await mqtt.async_publish(self.hass, topic, "PRESS")
-			_LOGGER.warning("Successfully published mute command to HASS.Agent")
-		except Exception as e:
-			_LOGGER.error("Failed to publish mute command to MQTT: %s", e)
-			
-		# Also update through parent entity
-		await self.parent.async_mute(False)
+		# Presses the HASS.Agent mute toggle only if muted
+		await self.parent.async_set_mute(False)
 		
 	async def async_update_state(self):
 		"""Update the entity state."""
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 
-class ComputerLockButton(ButtonEntity):
+class ComputerLockButton(IndexedEntity, ButtonEntity):
 	"""Lock control button for Computer."""
 	
-	def __init__(self, hass, entry_id, config, parent_entity):
+	def __init__(self, hass, ctx, config, parent_entity):
 		"""Initialize lock button entity."""
 		self.hass = hass
-		self._entry_id = entry_id
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
 		self._device_name = config[CONF_DEVICE_NAME]
 		self.parent = parent_entity
 		self._attr_unique_id = f"computer_{self._device_name.lower()}_lock"
@@ -1043,48 +1005,39 @@ class ComputerLockButton(ButtonEntity):
 		# Explicitly set the entity_id with the correct domain (button)
 		self.entity_id = f"button.computer_{self._device_name.lower()}_lock"
 		
+	@timed_service_call
 	async def async_press(self):
 		"""Handle button press."""
 		_LOGGER.warning("Button press action for %s - sending to MQTT topic", self.entity_id) 
 		
-		# Log this action to the Home Assistant logbook
-		from homeassistant.components import logbook
-		await logbook.async_log_entry(
-			self.hass,
+		# Log this action to the Home Assistant logbook (user actions are never aggregated)
+		self._ctx.logbook.log_action(
 			"Computer Lock",
 			f"Sent lock command to {self.parent._device_name} via MQTT",
-			entity_id=self.entity_id,
-			domain="button"
+			self.entity_id,
+			"button"
 		)
 		
-		# Send the MQTT command directly rather than through the parent entity
-		device_name_case = self._device_name  # Preserve case exactly as it appears in HASS.Agent
-		topic = f"{MQTT_BASE_TOPIC}/button/{device_name_case}/{device_name_case}_lock/set"
-		
-		try:
-			# Log the exact MQTT command being sent
-			_LOGGER.warning("Sending lock command to MQTT topic: %s", topic)
-			
-			# Any payload will trigger the button press
-			await mqtt.async_publish(self.hass, topic, "PRESS")
-			_LOGGER.warning("Successfully published lock command to HASS.Agent")
-		except Exception as e:
-			_LOGGER.error("Failed to publish lock command to MQTT: %s", e)
-		
-		# Still call the parent method to update internal state
-		await self.parent.async_toggle_enforce_lock()
+		# Update the parent's enforce lock first. When that starts relocking an
+		# unlocked computer, wait for its lock command instead of sending another
+		relock = await self.parent.async_toggle_enforce_lock()
+		if relock is not None:
+			await relock
+		else:
+			await self.parent.async_lock()
 		
 	async def async_update_state(self):
 		"""Update the entity state."""
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 
-class ComputerEnforceLockSwitch(SwitchEntity):
+class ComputerEnforceLockSwitch(IndexedEntity, SwitchEntity):
 	"""Enforce Lock control switch for Computer."""
 	
-	def __init__(self, hass, entry_id, config, parent_entity):
+	def __init__(self, hass, ctx, config, parent_entity):
 		"""Initialize enforce lock switch entity."""
 		self.hass = hass
-		self._entry_id = entry_id
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
 		self._device_name = config[CONF_DEVICE_NAME]
 		self.parent = parent_entity
 		self._attr_unique_id = f"computer_{self._device_name.lower()}_enforce_lock"
@@ -1109,11 +1062,13 @@ class ComputerEnforceLockSwitch(SwitchEntity):
 		"""Return true if enforce lock is enabled."""
 		return self.parent._enforce_lock
 		
+	@timed_service_call
 	async def async_turn_on(self, **kwargs):
 		"""Turn on enforce lock."""
 		if not self.parent._enforce_lock:
 			await self.parent.async_toggle_enforce_lock()
 		
+	@timed_service_call
 	async def async_turn_off(self, **kwargs):
 		"""Turn off enforce lock."""
 		if self.parent._enforce_lock:
@@ -1121,15 +1076,16 @@ class ComputerEnforceLockSwitch(SwitchEntity):
 		
 	async def async_update_state(self):
 		"""Update the entity state."""
-		self.async_write_ha_state() 
+		self._ctx.writer.schedule(self) 
 
-class ComputerActiveWindowSensor(SensorEntity):
+class ComputerActiveWindowSensor(IndexedEntity, SensorEntity):
 	"""Active window sensor for Computer."""
 	
-	def __init__(self, hass, entry_id, config, parent_entity):
+	def __init__(self, hass, ctx, config, parent_entity):
 		"""Initialize active window sensor entity."""
 		self.hass = hass
-		self._entry_id = entry_id
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
 		self._device_name = config[CONF_DEVICE_NAME]
 		self.parent = parent_entity
 		self._attr_unique_id = f"computer_{self._device_name.lower()}_active_window"
@@ -1160,15 +1116,16 @@ class ComputerActiveWindowSensor(SensorEntity):
 		
 	async def async_update_state(self):
 		"""Update the entity state."""
-		self.async_write_ha_state()
+		self._ctx.writer.schedule(self)
 
-class ComputerSessionStateSensor(SensorEntity):
+class ComputerSessionStateSensor(IndexedEntity, SensorEntity):
 	"""Session state sensor for Computer."""
 	
-	def __init__(self, hass, entry_id, config, parent_entity):
+	def __init__(self, hass, ctx, config, parent_entity):
 		"""Initialize session state sensor entity."""
 		self.hass = hass
-		self._entry_id = entry_id
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
 		self._device_name = config[CONF_DEVICE_NAME]
 		self.parent = parent_entity
 		self._attr_unique_id = f"computer_{self._device_name.lower()}_session_state"
@@ -1201,83 +1158,93 @@ class ComputerSessionStateSensor(SensorEntity):
 		
 	async def async_update_state(self):
 		"""Update the entity state."""
-		self.async_write_ha_state() 
+		self._ctx.writer.schedule(self) 
 
-async def async_load_platform_entities(hass, domain, platform, entities):
-	"""Load entities for a specific platform manually to ensure they're available."""
-	from homeassistant.helpers.entity_platform import EntityPlatform
-	from homeassistant.helpers.entity_component import EntityComponent
-	from datetime import timedelta
-	from homeassistant.helpers import entity_registry as er
-	
-	_LOGGER.warning("Manual entity registration being performed for platform %s", platform)
-	
-	# First check if any entities are already registered to avoid duplicates
-	registry = er.async_get(hass)
-	filtered_entities = []
-	
-	for entity in entities:
-		try:
-			# Check if entity is already registered
-			existing = registry.async_get_entity_id(domain, platform, entity.unique_id)
-			if existing:
-				_LOGGER.warning("Entity %s with unique_id %s is already registered as %s, skipping registration",
-					entity.entity_id, entity.unique_id, existing)
-				
-				# Still make sure the entity is available
-				entity._attr_available = True
-				entity.async_write_ha_state()
-				continue
-			
-			filtered_entities.append(entity)
-		except Exception as e:
-			_LOGGER.error("Error checking entity registration for %s: %s", entity.entity_id, e)
-			filtered_entities.append(entity)
-	
-	# If all entities were already registered, return early
-	if not filtered_entities:
-		_LOGGER.warning("All entities for platform %s are already registered, skipping", platform)
-		return True
-	
-	# Create or get component
-	component = EntityComponent(_LOGGER, domain, hass)
-	
-	# Create platform if needed
-	platform_instance = EntityPlatform(
-		hass=hass,
-		logger=_LOGGER,
-		domain=domain,
-		platform_name=platform,
-		platform=None,
-		entity_namespace=None,
-		scan_interval=timedelta(seconds=30),
-	)
-	
-	# Add entities to platform
-	await platform_instance.async_add_entities(filtered_entities)
+# Metric sensors: key -> (name, icon, unit, value function, attributes function)
+METRIC_SENSORS = {
+	"inbound_messages": (
+		"Inbound Messages", "mdi:download-network", "messages",
+		lambda m: m.inbound_total,
+		lambda m: {"per_minute": round(m.inbound_per_minute(), 1), **m.inbound}
+	),
+	"outbound_messages": (
+		"Outbound Messages", "mdi:upload-network", "messages",
+		lambda m: m.outbound,
+		lambda m: {"per_minute": round(m.outbound_per_minute(), 1)}
+	),
+	"dropped_messages": (
+		"Dropped Messages", "mdi:filter-remove", "messages",
+		lambda m: m.dropped,
+		lambda m: {"suppressed_echoes": m.suppressed_echoes, "undecodable": m.undecodable}
+	),
+	"state_writes": (
+		"State Writes", "mdi:database-edit", "writes",
+		lambda m: m.state_writes,
+		lambda m: {"coalesced_state_writes": m.coalesced_state_writes}
+	),
+	"relock_latency": (
+		"Relock Latency", "mdi:lock-clock", "ms",
+		lambda m: m.last_relock_ms,
+		lambda m: {"relocks": m.relocks, "lock_commands": m.relock_attempts}
+	),
+	"command_latency": (
+		"Command Latency", "mdi:swap-horizontal", "ms",
+		lambda m: m.last_command_rtt_ms,
+		lambda m: {
+			"confirmed": m.commands_confirmed,
+			"retried": m.commands_retried,
+			"expired": m.commands_expired,
+			"merged": m.commands_merged,
+			"skipped": m.commands_skipped,
+		}
+	),
+	"handler_latency": (
+		"Handler Latency", "mdi:timer-outline", "ms",
+		lambda m: m.latency_percentile(95),
+		lambda m: {"p50": m.latency_percentile(50), "p99": m.latency_percentile(99)}
+	),
+}
+
+class ComputerMetricSensor(IndexedEntity, SensorEntity):
+	"""Diagnostic sensor exposing one runtime metric of a Computer."""
 	
-	# Run async_added_to_hass for each entity
-	for entity in filtered_entities:
-		if hasattr(entity, "async_added_to_hass") and callable(entity.async_added_to_hass):
-			if not entity.registry_entry:
-				try:
-					registry.async_get_or_create(
-						domain=entity.entity_id.split(".", 1)[0],
-						platform=platform,
-						unique_id=entity.unique_id,
-					)
-				except Exception as e:
-					_LOGGER.error("Error creating registry entry: %s", e)
-					
-			try:
-				await entity.async_added_to_hass()
-				_LOGGER.warning("Added entity %s to hass", entity.entity_id)
-			except Exception as e:
-				_LOGGER.error("Error adding entity %s to hass: %s", entity.entity_id, e)
-				
-	# Make entities available immediately
-	for entity in filtered_entities:
-		entity._attr_available = True
-		entity.async_write_ha_state()
+	def __init__(self, hass, ctx, config, parent_entity, key):
+		"""Initialize metric sensor entity."""
+		self.hass = hass
+		self._ctx = ctx
+		self._entry_id = ctx.entry_id
+		self._device_name = config[CONF_DEVICE_NAME]
+		self.parent = parent_entity
+		self._key = key
+		name, icon, unit, self._value_fn, self._attributes_fn = METRIC_SENSORS[key]
+		self._attr_unique_id = f"computer_{self._device_name.lower()}_{key}"
+		self._attr_name = f"{self.parent._attr_name} {name}"
+		self._attr_has_entity_name = True  # Use the device name + entity name format
+		self._attr_device_info = {
+			"identifiers": {(DOMAIN, self._device_name.lower())},
+			"name": f"Computer {self._device_name}",
+			"manufacturer": "Home Assistant",
+			"model": "Computer"
+		}
+		self._attr_icon = icon
+		self._attr_native_unit_of_measurement = unit
+		self._attr_entity_category = EntityCategory.DIAGNOSTIC
+		self._attr_should_poll = False  # Refreshed by the parent on a fixed interval
+		self._attr_available = True
+		
+		# Explicitly set the entity_id with the correct domain (sensor)
+		self.entity_id = f"sensor.computer_{self._device_name.lower()}_{key}"
 		
-	return True 
\ No newline at end of file
+	@property
+	def native_value(self):
+		"""Return the current metric value."""
+		return self._value_fn(self._ctx.metrics)
+		
+	@property
+	def extra_state_attributes(self):
+		"""Return additional attributes."""
+		return self._attributes_fn(self._ctx.metrics)
+		
+	async def async_update_state(self):
+		"""Update the entity state."""
+		self._ctx.writer.schedule(self)
@@ -3,11 +3,23 @@ import logging
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_NAME
+from homeassistant.core import callback
 from .const import (
     DOMAIN, CONF_DEVICE_NAME,
     CONF_POWER_ON_ACTION, CONF_POWER_OFF_ACTION,
     POWER_ON_POWER, POWER_ON_WAKE,
-    POWER_OFF_POWER, POWER_OFF_HIBERNATE, POWER_OFF_SLEEP
+    POWER_OFF_POWER, POWER_OFF_HIBERNATE, POWER_OFF_SLEEP,
+    CONF_VOLUME_DEBOUNCE, CONF_VOLUME_MAX_RATE,
+    DEFAULT_VOLUME_DEBOUNCE, DEFAULT_VOLUME_MAX_RATE,
+    CONF_LOGBOOK_WINDOW, DEFAULT_LOGBOOK_WINDOW,
+    CONF_RETAIN_STATE, DEFAULT_RETAIN_STATE,
+    CONF_RESYNC_INTERVAL, DEFAULT_RESYNC_INTERVAL,
+    CONF_COMBINED_STATE, DEFAULT_COMBINED_STATE,
+    CONF_LEGACY_TOPICS, DEFAULT_LEGACY_TOPICS,
+    CONF_RESTORE_MAX_AGE, DEFAULT_RESTORE_MAX_AGE,
+    CONF_HEARTBEAT_TIMEOUT, DEFAULT_HEARTBEAT_TIMEOUT,
+    CONF_CONFIRMED_COMMANDS, DEFAULT_CONFIRMED_COMMANDS,
+    CONF_OFFLINE_QUEUE_TTL, DEFAULT_OFFLINE_QUEUE_TTL
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -17,6 +29,12 @@ class ComputerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Return the options flow for this handler."""
+        return ComputerOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         errors = {}
@@ -54,4 +72,68 @@ class ComputerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 ])
             }),
             errors=errors
-        ) 
\ No newline at end of file
+        )
+
+
+class ComputerOptionsFlow(config_entries.OptionsFlow):
+    """Handle Computer options."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self._config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema({
+                vol.Required(
+                    CONF_VOLUME_DEBOUNCE,
+                    default=options.get(CONF_VOLUME_DEBOUNCE, DEFAULT_VOLUME_DEBOUNCE)
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+                vol.Required(
+                    CONF_VOLUME_MAX_RATE,
+                    default=options.get(CONF_VOLUME_MAX_RATE, DEFAULT_VOLUME_MAX_RATE)
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=50)),
+                vol.Required(
+                    CONF_LOGBOOK_WINDOW,
+                    default=options.get(CONF_LOGBOOK_WINDOW, DEFAULT_LOGBOOK_WINDOW)
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Required(
+                    CONF_RETAIN_STATE,
+                    default=options.get(CONF_RETAIN_STATE, DEFAULT_RETAIN_STATE)
+                ): bool,
+                vol.Required(
+                    CONF_RESYNC_INTERVAL,
+                    default=options.get(CONF_RESYNC_INTERVAL, DEFAULT_RESYNC_INTERVAL)
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+                vol.Required(
+                    CONF_COMBINED_STATE,
+                    default=options.get(CONF_COMBINED_STATE, DEFAULT_COMBINED_STATE)
+                ): bool,
+                vol.Required(
+                    CONF_LEGACY_TOPICS,
+                    default=options.get(CONF_LEGACY_TOPICS, DEFAULT_LEGACY_TOPICS)
+                ): bool,
+                vol.Required(
+                    CONF_RESTORE_MAX_AGE,
+                    default=options.get(CONF_RESTORE_MAX_AGE, DEFAULT_RESTORE_MAX_AGE)
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=604800)),
+                vol.Required(
+                    CONF_HEARTBEAT_TIMEOUT,
+                    default=options.get(CONF_HEARTBEAT_TIMEOUT, DEFAULT_HEARTBEAT_TIMEOUT)
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+                vol.Required(
+                    CONF_CONFIRMED_COMMANDS,
+                    default=options.get(CONF_CONFIRMED_COMMANDS, DEFAULT_CONFIRMED_COMMANDS)
+                ): bool,
+                vol.Required(
+                    CONF_OFFLINE_QUEUE_TTL,
+                    default=options.get(CONF_OFFLINE_QUEUE_TTL, DEFAULT_OFFLINE_QUEUE_TTL)
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+            })
+        )
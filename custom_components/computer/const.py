@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 DOMAIN = "computer"
 
 # Services
@@ -10,6 +12,12 @@ ATTR_VOLUME_LEVEL = "volume_level"
 ATTR_ACTIVE_WINDOW = "activewindow"
 ATTR_SESSION_STATE = "sessionstate"
 
+# Base topic shared by HASS.Agent and this integration
+MQTT_BASE_TOPIC = "homeassistant"
+
+# Overall deadline (seconds) for the MQTT subscriptions made during setup
+MQTT_SUBSCRIBE_TIMEOUT = 10
+
 # Configuration
 CONF_DEVICE_NAME = "device_name"
 CONF_POWER_ON_ACTION = "power_on_action"
@@ -23,4 +31,79 @@ POWER_ON_ACTIONS = [POWER_ON_POWER, POWER_ON_WAKE]
 POWER_OFF_POWER = "power_off"
 POWER_OFF_HIBERNATE = "hibernate"
 POWER_OFF_SLEEP = "sleep"
-POWER_OFF_ACTIONS = [POWER_OFF_POWER, POWER_OFF_HIBERNATE, POWER_OFF_SLEEP] 
\ No newline at end of file
+POWER_OFF_ACTIONS = [POWER_OFF_POWER, POWER_OFF_HIBERNATE, POWER_OFF_SLEEP] 
+
+# Options
+CONF_VOLUME_DEBOUNCE = "volume_debounce"
+CONF_VOLUME_MAX_RATE = "volume_max_rate"
+CONF_LOGBOOK_WINDOW = "logbook_window"
+CONF_RETAIN_STATE = "retain_state"
+CONF_RESYNC_INTERVAL = "resync_interval"
+CONF_COMBINED_STATE = "combined_state"
+CONF_LEGACY_TOPICS = "legacy_topics"
+CONF_RESTORE_MAX_AGE = "restore_max_age"
+CONF_HEARTBEAT_TIMEOUT = "heartbeat_timeout"
+CONF_CONFIRMED_COMMANDS = "confirmed_commands"
+CONF_OFFLINE_QUEUE_TTL = "offline_queue_ttl"
+
+# Defaults for options
+DEFAULT_VOLUME_DEBOUNCE = 0.25  # seconds of quiet before a volume command is sent
+DEFAULT_VOLUME_MAX_RATE = 4.0  # volume commands per second during a knob sweep
+DEFAULT_LOGBOOK_WINDOW = 300  # seconds of MQTT updates summarised per logbook entry
+DEFAULT_RETAIN_STATE = False  # publish state with the MQTT retain flag
+DEFAULT_RESYNC_INTERVAL = 0  # seconds between full state republishes, 0 = never
+DEFAULT_COMBINED_STATE = False  # publish the retained combined state document
+DEFAULT_LEGACY_TOPICS = True  # publish the update topic and HASS.Agent sensor topics
+DEFAULT_RESTORE_MAX_AGE = 900  # seconds a restored state is trusted without a full refresh
+DEFAULT_HEARTBEAT_TIMEOUT = 0  # seconds without messages before unavailable, 0 = off
+DEFAULT_CONFIRMED_COMMANDS = False  # only change state once HASS.Agent reports it
+DEFAULT_OFFLINE_QUEUE_TTL = 300  # seconds commands are held for an offline computer, 0 = off
+
+# Echo suppression: how long (seconds) a published (topic, payload) pair is
+# remembered so its echo from the broker can be recognised and dropped
+ECHO_SUPPRESSION_TTL = 5.0
+
+# Startup refresh of HASS.Agent sensors, shared by all computers. Can be
+# overridden in configuration.yaml under "computer:".
+CONF_REFRESH_JITTER = "refresh_jitter"
+CONF_REFRESH_MAX_IN_FLIGHT = "refresh_max_in_flight"
+CONF_REFRESH_TIMEOUT = "refresh_timeout"
+CONF_STALE_AFTER = "stale_after"
+REFRESH_JITTER = 2.0  # maximum random delay (seconds) before a request is sent
+REFRESH_MAX_IN_FLIGHT = 4  # requests awaiting their first reply at once
+REFRESH_REPLY_TIMEOUT = 10.0  # seconds to wait for the first reply
+# Background refresh of computers that have gone quiet
+REFRESH_STALE_AFTER = 600  # seconds without any sensor update, 0 = never refresh
+REFRESH_CHECK_INTERVAL = 30  # seconds between staleness checks
+REFRESH_BACKOFF_BASE = 60  # first retry delay (seconds) for an unresponsive computer
+REFRESH_BACKOFF_MAX = 3600  # longest retry delay (seconds)
+
+# Enforce lock: delay (seconds) before the first lock command is repeated,
+# doubling after every attempt up to the maximum
+ENFORCE_LOCK_RETRY_BASE = 2.0
+ENFORCE_LOCK_RETRY_MAX = 60.0
+
+# Command acknowledgement: seconds to wait for the state confirming a
+# command before it is sent again, and how often it is sent again
+COMMAND_ACK_TIMEOUT = 5.0
+COMMAND_RETRIES = 2
+# Requests for a command within this many seconds of the last one are merged
+COMMAND_SETTLE_TIME = 1.0
+
+# Most commands held for an offline computer (one per command topic)
+OFFLINE_QUEUE_SIZE = 16
+
+# Most messages queued on each outbound priority lane
+OUTBOUND_LANE_SIZE = 256
+
+# Inbound MQTT messages: most queued per computer, and how many
+# computers are handled at once
+INBOUND_QUEUE_SIZE = 32
+INBOUND_WORKERS = 2
+
+# Shared timer wheel for per-device timeouts such as the heartbeat
+TIMER_WHEEL_RESOLUTION = 1.0  # seconds per tick
+TIMER_WHEEL_SLOTS = 512  # ticks per revolution
+
+# How often the diagnostic metric sensors are refreshed
+METRICS_REFRESH_INTERVAL = timedelta(seconds=30)
@@ -0,0 +1,96 @@
+"""Per-device context shared by all entities of a Computer."""
+from dataclasses import asdict, dataclass
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from .const import MQTT_BASE_TOPIC
+from .echo import EchoSuppressor
+from .logbook_aggregator import LogbookAggregator
+from .metrics import DeviceMetrics
+from .write_scheduler import StateWriteCoalescer
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceTopics:
+	"""MQTT topics of one computer, built once when the entry is set up."""
+
+	# State published by this integration
+	update: str
+	state: str
+	# HASS.Agent sensors
+	activewindow: str
+	sessionstate: str
+	currentvolume: str
+	availability: str
+	# HASS.Agent buttons
+	lock: str
+	mute: str
+	setvolume: str
+	publishallsensors: str
+
+	@classmethod
+	def for_device(cls, device_name):
+		"""Build the topics for a device name (case preserved, as used by HASS.Agent)."""
+		sensor_base = f"{MQTT_BASE_TOPIC}/sensor/{device_name}"
+		button_base = f"{MQTT_BASE_TOPIC}/button/{device_name}"
+		return cls(
+			update=f"{MQTT_BASE_TOPIC}/Computer/Computer.{device_name}/update",
+			state=f"{MQTT_BASE_TOPIC}/Computer/Computer.{device_name}/state",
+			activewindow=f"{sensor_base}/{device_name}_activewindow/state",
+			sessionstate=f"{sensor_base}/{device_name}_sessionstate/state",
+			currentvolume=f"{sensor_base}/{device_name}_currentvolume/state",
+			availability=f"{sensor_base}/availability",
+			lock=f"{button_base}/{device_name}_lock/set",
+			mute=f"{button_base}/{device_name}_mute/set",
+			setvolume=f"{button_base}/{device_name}_setvolume/set",
+			publishallsensors=f"{button_base}/{device_name}_publishallsensors/set",
+		)
+
+	def as_dict(self):
+		"""Return the topics keyed by purpose."""
+		return asdict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceContext:
+	"""Everything the entities of one computer share.
+
+	Created once in async_setup_entry and handed to every entity, so hot paths
+	neither rebuild topic strings nor look siblings up in hass.data. The
+	context itself is immutable; `entities` is a read-only view that fills in
+	as the entities are created.
+	"""
+
+	entry_id: str
+	device_name: str
+	topics: DeviceTopics
+	# role -> entity ("main", "volume", "mute", ...)
+	entities: Mapping[str, Any]
+	metrics: DeviceMetrics
+	echo: EchoSuppressor
+	writer: StateWriteCoalescer
+	logbook: LogbookAggregator
+
+	@classmethod
+	def create(cls, hass, entry_id, device_name, entities, logbook_window):
+		"""Create the context for a device.
+
+		entities is the role -> entity dict stored in hass.data; the context
+		keeps a read-only view of it.
+		"""
+		metrics = DeviceMetrics()
+		return cls(
+			entry_id=entry_id,
+			device_name=device_name,
+			topics=DeviceTopics.for_device(device_name),
+			entities=MappingProxyType(entities),
+			metrics=metrics,
+			echo=EchoSuppressor(),
+			writer=StateWriteCoalescer(hass, metrics),
+			logbook=LogbookAggregator(hass, device_name, logbook_window),
+		)
+
+	@property
+	def main(self):
+		"""Return the main computer entity."""
+		return self.entities["main"]
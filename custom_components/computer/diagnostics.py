@@ -0,0 +1,49 @@
+"""Diagnostics support for the Computer integration."""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_DEVICE_NAME
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+	"""Return diagnostics for a config entry."""
+	domain_data = hass.data.get(DOMAIN, {})
+	entities = domain_data.get("entities", {}).get(entry.entry_id)
+	if isinstance(entities, dict):
+		main = entities.get("main")
+	else:
+		# Old single-entity structure
+		main = entities
+		entities = {"main": main} if main is not None else {}
+
+	device_name = entry.data.get(CONF_DEVICE_NAME)
+	router = domain_data.get("router")
+
+	diagnostics = {
+		"entry": {
+			"title": entry.title,
+			"data": dict(entry.data),
+			"options": dict(entry.options),
+		},
+		"subscriptions": router.async_get_diagnostics(device_name) if router else None,
+	}
+	if main is None:
+		diagnostics["error"] = "Entry is not set up"
+		return diagnostics
+
+	diagnostics["topics"] = main._ctx.topics.as_dict()
+	diagnostics["state"] = {
+		"state": main.state,
+		"available": main.available,
+		"attributes": dict(main.extra_state_attributes),
+		"entities": {role: entity.entity_id for role, entity in entities.items()},
+	}
+	diagnostics["metrics"] = main._ctx.metrics.as_diagnostics()
+	diagnostics["outbox"] = main._outbox.as_diagnostics()
+	outbound = domain_data.get("outbound")
+	if outbound is not None:
+		diagnostics["outbound"] = outbound.as_diagnostics()
+	refresh = domain_data.get("refresh")
+	if refresh is not None:
+		diagnostics["refresh"] = refresh.as_diagnostics(device_name)
+	return diagnostics
@@ -0,0 +1,57 @@
+"""Echo suppression for MQTT messages published by the Computer integration."""
+import logging
+import time
+
+from .const import ECHO_SUPPRESSION_TTL
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EchoSuppressor:
+	"""Remember recently published (topic, payload) pairs so their echoes can be dropped.
+
+	Every publish is recorded with a short expiry. When the broker delivers the
+	same topic/payload back to our own subscription within that window, the
+	message is recognised as self-originated and consumed instead of being
+	handed to the entity code.
+	"""
+
+	def __init__(self, ttl=ECHO_SUPPRESSION_TTL):
+		"""Initialize the suppressor."""
+		self._ttl = ttl
+		# (topic, payload) -> list of expiry timestamps, one per outstanding publish
+		self._pending = {}
+		self.suppressed = 0
+
+	def record(self, topic, payload):
+		"""Record an outgoing publish."""
+		now = time.monotonic()
+		self._prune(now)
+		self._pending.setdefault((topic, str(payload)), []).append(now + self._ttl)
+
+	def is_echo(self, topic, payload):
+		"""Return True (and consume the record) if this message is our own echo."""
+		key = (topic, payload)
+		expiries = self._pending.get(key)
+		if not expiries:
+			return False
+
+		now = time.monotonic()
+		while expiries and expiries[0] < now:
+			expiries.pop(0)
+		if not expiries:
+			del self._pending[key]
+			return False
+
+		expiries.pop(0)
+		if not expiries:
+			del self._pending[key]
+		self.suppressed += 1
+		_LOGGER.debug("Suppressed echo on %s (%d suppressed so far)", topic, self.suppressed)
+		return True
+
+	def _prune(self, now):
+		"""Drop expired records so the cache stays small."""
+		expired = [key for key, expiries in self._pending.items() if expiries[-1] < now]
+		for key in expired:
+			del self._pending[key]
@@ -0,0 +1,110 @@
+"""Enforce-lock state machine for a Computer device."""
+import logging
+
+from .const import ENFORCE_LOCK_RETRY_BASE, ENFORCE_LOCK_RETRY_MAX
+
+_LOGGER = logging.getLogger(__name__)
+
+SESSION_LOCKED = "locked"
+SESSION_UNLOCKED = "unlocked"
+
+# Machine states
+STATE_OFF = "off"
+STATE_WATCHING = "watching"
+STATE_RELOCKING = "relocking"
+
+
+class EnforceLock:
+	"""Keep a computer locked while enforce lock is on.
+
+	Driven directly by the sessionstate messages from HASS.Agent:
+
+	- off: enforce lock disabled, nothing happens.
+	- watching: enabled and the session is locked (or unknown).
+	- relocking: the session was reported unlocked. A lock command is sent
+	  straight away and repeated with exponential backoff until HASS.Agent
+	  reports the session locked again, which records the unlock-to-relock
+	  latency and returns to watching.
+	"""
+
+	def __init__(self, hass, send_lock, metrics, name):
+		"""Initialize the state machine.
+
+		send_lock is an async callable publishing the lock command.
+		"""
+		self.hass = hass
+		self._send_lock = send_lock
+		self._metrics = metrics
+		self._name = name
+		self.state = STATE_OFF
+		# Loop time the unlock being corrected was reported
+		self._unlocked_at = None
+		self._attempts = 0
+		self._handle = None
+
+	@property
+	def enabled(self):
+		"""Return True if enforce lock is on."""
+		return self.state != STATE_OFF
+
+	def enable(self, session_state):
+		"""Turn enforce lock on, relocking now if the session is unlocked.
+
+		Returns the task sending the lock command, or None if none was sent.
+		"""
+		if self.enabled:
+			return None
+		self.state = STATE_WATCHING
+		return self.session_state_changed(session_state)
+
+	def disable(self):
+		"""Turn enforce lock off and stop any relock in progress."""
+		self.cancel()
+		self.state = STATE_OFF
+
+	def session_state_changed(self, session_state):
+		"""Handle a session state reported by HASS.Agent.
+
+		Returns the task sending the lock command if an unlock started
+		relocking, else None.
+		"""
+		session_state = str(session_state).lower()
+		if self.state == STATE_WATCHING and session_state == SESSION_UNLOCKED:
+			_LOGGER.info("Enforced lock active: re-locking Computer %s", self._name)
+			self.state = STATE_RELOCKING
+			self._unlocked_at = self.hass.loop.time()
+			self._attempts = 0
+			return self._attempt()
+		elif self.state == STATE_RELOCKING and session_state == SESSION_LOCKED:
+			latency = self.hass.loop.time() - self._unlocked_at
+			self._metrics.record_relock(latency, self._attempts)
+			_LOGGER.info(
+				"Computer %s re-locked %.1f s after unlocking (%d lock command(s))",
+				self._name, latency, self._attempts
+			)
+			self.cancel()
+			self.state = STATE_WATCHING
+		return None
+
+	def cancel(self):
+		"""Stop retrying the lock command."""
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+		self._unlocked_at = None
+
+	def _attempt(self):
+		"""Send the lock command and schedule the next retry.
+
+		Returns the task sending the lock command.
+		"""
+		self._handle = None
+		if self.state != STATE_RELOCKING:
+			return None
+		self._attempts += 1
+		if self._attempts > 1:
+			_LOGGER.debug("Computer %s still unlocked, lock attempt %d", self._name, self._attempts)
+		task = self.hass.async_create_task(self._send_lock())
+		delay = min(ENFORCE_LOCK_RETRY_BASE * 2 ** (self._attempts - 1), ENFORCE_LOCK_RETRY_MAX)
+		self._handle = self.hass.loop.call_later(delay, self._attempt)
+		return task
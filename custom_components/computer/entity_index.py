@@ -0,0 +1,62 @@
+"""Entity lookup index for the Computer integration services."""
+import logging
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Role used for entries stored with the old single-entity layout
+ROLE_MAIN = "main"
+
+
+def async_index_entity(hass, ctx, entity):
+	"""Add an entity of a computer to the entity_id index under its live entity_id."""
+	role = next((role for role, other in ctx.entities.items() if other is entity), ROLE_MAIN)
+	domain_data = hass.data.setdefault(DOMAIN, {})
+	domain_data.setdefault("entity_index", {})[entity.entity_id] = (ctx.entry_id, role, entity)
+	domain_data.setdefault("entity_index_by_entry", {}).setdefault(ctx.entry_id, set()).add(entity.entity_id)
+	_LOGGER.debug("Indexed %s as %s of entry %s", entity.entity_id, role, ctx.entry_id)
+
+
+def async_unindex_entity(hass, entry_id, entity):
+	"""Remove an entity from the entity_id index."""
+	domain_data = hass.data.get(DOMAIN, {})
+	index = domain_data.get("entity_index", {})
+	indexed = index.get(entity.entity_id)
+	if indexed is not None and indexed[2] is entity:
+		del index[entity.entity_id]
+	entity_ids = domain_data.get("entity_index_by_entry", {}).get(entry_id)
+	if entity_ids is not None:
+		entity_ids.discard(entity.entity_id)
+
+
+class IndexedEntity:
+	"""Mixin keeping an entity of a computer in the service index while it is added.
+
+	The index is keyed by the entity_id the registry actually assigned, which
+	differs from the suggested one after a rename or a "_2" suffix. A renamed
+	entity is removed and added again, so the index follows it.
+	"""
+
+	async def async_added_to_hass(self):
+		"""Index the entity under its live entity_id."""
+		await super().async_added_to_hass()
+		async_index_entity(self.hass, self._ctx, self)
+
+	async def async_will_remove_from_hass(self):
+		"""Drop the entity from the index."""
+		async_unindex_entity(self.hass, self._ctx.entry_id, self)
+		await super().async_will_remove_from_hass()
+
+
+def async_remove_entry_index(hass, entry_id):
+	"""Remove the entities of a config entry from the entity_id index."""
+	domain_data = hass.data.get(DOMAIN, {})
+	index = domain_data.get("entity_index", {})
+	for entity_id in domain_data.get("entity_index_by_entry", {}).pop(entry_id, []):
+		index.pop(entity_id, None)
+
+
+def async_lookup_entity(hass, entity_id):
+	"""Return (entry_id, role, entity) for an entity_id, or None if unknown."""
+	return hass.data.get(DOMAIN, {}).get("entity_index", {}).get(entity_id)
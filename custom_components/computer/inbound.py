@@ -0,0 +1,126 @@
+"""Per-device inbound message queues drained fairly across computers."""
+import asyncio
+from collections import deque
+import logging
+import time
+
+from .const import INBOUND_QUEUE_SIZE, INBOUND_WORKERS
+from .metrics import LatencyHistogram
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _DeviceQueue:
+	"""Messages waiting to be handled for one computer."""
+
+	__slots__ = ("messages", "wait", "received", "handled", "overflowed", "peak")
+
+	def __init__(self):
+		"""Initialize the queue."""
+		# (handler, message, monotonic time received)
+		self.messages = deque()
+		# Time messages spent queued before their handler started
+		self.wait = LatencyHistogram()
+		self.received = 0
+		self.handled = 0
+		self.overflowed = 0
+		self.peak = 0
+
+
+class InboundQueues:
+	"""Hand MQTT messages to their handlers without one computer delaying the rest.
+
+	Every computer gets its own queue of at most `max_size` messages. When it
+	is full, the oldest queued message on the same topic is dropped (or the
+	oldest message if none is), so a computer flooding one sensor only
+	loses its own superseded updates. Up to `workers` tasks take turns over
+	the computers with queued messages, handling one message per computer
+	per turn, so a quiet computer waits for at most one message of every
+	busy one. Messages of one computer are handled in order, one at a time.
+	"""
+
+	def __init__(self, hass, max_size=INBOUND_QUEUE_SIZE, workers=INBOUND_WORKERS):
+		"""Initialize the queues."""
+		self.hass = hass
+		self._max_size = max_size
+		self._max_workers = max(1, workers)
+		# device name -> _DeviceQueue
+		self._queues = {}
+		# Devices with queued messages not being handled right now, in turn order
+		self._ready = deque()
+		# Devices that are ready or being handled
+		self._scheduled = set()
+		self._workers = 0
+
+	def submit(self, device_name, handler, msg, received):
+		"""Queue a message for a device's handler.
+
+		received is the monotonic time the message arrived; it is passed on
+		to the handler so its latency includes the time spent queued.
+		"""
+		queue = self._queues.get(device_name)
+		if queue is None:
+			queue = self._queues[device_name] = _DeviceQueue()
+		queue.received += 1
+		messages = queue.messages
+		if len(messages) >= self._max_size:
+			stale = next((item for item in messages if item[1].topic == msg.topic), messages[0])
+			messages.remove(stale)
+			queue.overflowed += 1
+			_LOGGER.debug("Inbound queue of %s is full, dropping a message on %s", device_name, stale[1].topic)
+		messages.append((handler, msg, received))
+		queue.peak = max(queue.peak, len(messages))
+		if device_name not in self._scheduled:
+			self._scheduled.add(device_name)
+			self._ready.append(device_name)
+
+		if self._ready and self._workers < self._max_workers:
+			self._workers += 1
+			self.hass.async_create_task(self._async_work())
+
+	def forget(self, device_name):
+		"""Drop the queue of a device that is no longer routed."""
+		queue = self._queues.pop(device_name, None)
+		if queue is not None:
+			queue.messages.clear()
+
+	def as_diagnostics(self, device_name):
+		"""Return the queue state of a device."""
+		queue = self._queues.get(device_name)
+		if queue is None:
+			return None
+		return {
+			"queued": len(queue.messages),
+			"peak": queue.peak,
+			"received": queue.received,
+			"handled": queue.handled,
+			"overflowed": queue.overflowed,
+			"queue_wait": queue.wait.as_dict(),
+			"workers": self._workers,
+		}
+
+	async def _async_work(self):
+		"""Handle one message per ready device in turn until none are left."""
+		try:
+			while self._ready:
+				device_name = self._ready.popleft()
+				queue = self._queues.get(device_name)
+				if queue is None or not queue.messages:
+					self._scheduled.discard(device_name)
+					continue
+				handler, msg, received = queue.messages.popleft()
+				queue.wait.record(time.monotonic() - received)
+				try:
+					await handler(msg, received)
+				except Exception:
+					_LOGGER.exception("Error handling MQTT message on %s", msg.topic)
+				queue.handled += 1
+				current = self._queues.get(device_name)
+				if current is not None and current.messages:
+					self._ready.append(device_name)
+				else:
+					self._scheduled.discard(device_name)
+				# Let the event loop run between messages
+				await asyncio.sleep(0)
+		finally:
+			self._workers -= 1
@@ -0,0 +1,77 @@
+"""Aggregated logbook output for a Computer device."""
+import logging
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LogbookAggregator:
+	"""Batch high-volume logbook entries per category over a time window.
+
+	MQTT updates are counted per category and written as a single entry such
+	as "42 active window updates in the last 5 min" when the window closes.
+	User-initiated actions are still logged individually. A window of 0
+	logs every update individually.
+	"""
+
+	def __init__(self, hass, device_name, window):
+		"""Initialize the aggregator."""
+		self.hass = hass
+		self._device_name = device_name
+		self._window = window
+		self.entity_id = None
+		# category -> number of updates in the current window
+		self._counts = {}
+		self._handle = None
+
+	def configure(self, window):
+		"""Change the aggregation window, flushing what has been counted so far."""
+		self._flush()
+		self._window = window
+
+	def record(self, category, message):
+		"""Record an automatic update (e.g. an incoming MQTT message)."""
+		if not self._window:
+			self._write(message)
+			return
+
+		self._counts[category] = self._counts.get(category, 0) + 1
+		if self._handle is None:
+			self._handle = self.hass.loop.call_later(self._window, self._flush)
+
+	def log_action(self, name, message, entity_id, domain):
+		"""Log a user-initiated action as an individual entry."""
+		from homeassistant.components import logbook
+		logbook.async_log_entry(self.hass, name, message, domain=domain, entity_id=entity_id)
+
+	def cancel(self):
+		"""Drop the counts of the current window without writing them."""
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+		self._counts = {}
+
+	def _flush(self):
+		"""Write one entry per category for the window that just closed."""
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+		counts, self._counts = self._counts, {}
+		window_min = self._window / 60
+		for category, count in counts.items():
+			self._write(
+				f"{count} {category} update{'s' if count != 1 else ''} "
+				f"in the last {window_min:g} min"
+			)
+
+	def _write(self, message):
+		"""Write an entry for the device."""
+		from homeassistant.components import logbook
+		logbook.async_log_entry(
+			self.hass,
+			f"Computer {self._device_name}",
+			message,
+			domain=DOMAIN,
+			entity_id=self.entity_id
+		)
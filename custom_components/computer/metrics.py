@@ -0,0 +1,284 @@
+"""Runtime metrics for a Computer device."""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+import time
+
+# Number of recent handler latencies kept for percentile calculation
+LATENCY_SAMPLES = 512
+
+# Number of message timestamps kept per topic for diagnostics
+RECENT_MESSAGES = 20
+
+# Upper bounds (milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Set to [monotonic start time] while handling a computer.* service call or
+# an entity action (number.set_value, switch.turn_on, button.press, ...), so
+# the first command publish it causes can record the service-to-publish
+# latency. The list is emptied once recorded.
+SERVICE_CALL_STARTED = ContextVar("computer_service_call_started", default=None)
+
+
+@contextmanager
+def service_call_started():
+	"""Time the first command publish of a service call started now.
+
+	Nested calls keep the start time of the outermost one.
+	"""
+	if SERVICE_CALL_STARTED.get() is not None:
+		yield
+		return
+	token = SERVICE_CALL_STARTED.set([time.monotonic()])
+	try:
+		yield
+	finally:
+		SERVICE_CALL_STARTED.reset(token)
+
+
+def timed_service_call(func):
+	"""Decorate an entity action so its first command publish records the latency."""
+	@wraps(func)
+	async def wrapper(*args, **kwargs):
+		with service_call_started():
+			return await func(*args, **kwargs)
+	return wrapper
+
+
+class RollingCounter:
+	"""Count events over the last `window` seconds using one bucket per second.
+
+	Memory is fixed at `window` buckets regardless of the event rate.
+	"""
+
+	def __init__(self, window=60):
+		"""Initialize the counter."""
+		self._window = window
+		self._buckets = [0] * window
+		self._seconds = [0] * window
+
+	def add(self, now=None):
+		"""Count one event."""
+		second = int(time.monotonic() if now is None else now)
+		slot = second % self._window
+		if self._seconds[slot] != second:
+			self._seconds[slot] = second
+			self._buckets[slot] = 0
+		self._buckets[slot] += 1
+
+	def total(self, now=None):
+		"""Return the number of events in the window."""
+		second = int(time.monotonic() if now is None else now)
+		oldest = second - self._window
+		return sum(
+			count for count, bucket_second in zip(self._buckets, self._seconds)
+			if bucket_second > oldest
+		)
+
+	def per_minute(self, now=None):
+		"""Return the event rate in events per minute."""
+		return self.total(now) * 60 / self._window
+
+
+class LatencyHistogram:
+	"""Fixed-bucket latency histogram with constant memory."""
+
+	def __init__(self, bounds_ms=LATENCY_BUCKETS_MS):
+		"""Initialize the histogram."""
+		self._bounds = bounds_ms
+		# One bucket per bound plus one for everything above the last bound
+		self._counts = [0] * (len(bounds_ms) + 1)
+		self.count = 0
+		self.total_ms = 0.0
+
+	def record(self, seconds):
+		"""Add one latency sample."""
+		ms = seconds * 1000
+		self.count += 1
+		self.total_ms += ms
+		for index, bound in enumerate(self._bounds):
+			if ms <= bound:
+				self._counts[index] += 1
+				return
+		self._counts[-1] += 1
+
+	def as_dict(self):
+		"""Return the histogram in a JSON-serialisable form."""
+		buckets = {f"<={bound}ms": count for bound, count in zip(self._bounds, self._counts)}
+		buckets[f">{self._bounds[-1]}ms"] = self._counts[-1]
+		return {
+			"count": self.count,
+			"mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+			"buckets": buckets,
+		}
+
+
+class DeviceMetrics:
+	"""Counters, rolling rates and handler latency for one computer."""
+
+	def __init__(self):
+		"""Initialize the metrics."""
+		# sensor/topic category -> number of messages received
+		self.inbound = {}
+		self.outbound = 0
+		self.dropped = 0
+		# Of the dropped messages, those that were echoes of our own publishes
+		self.suppressed_echoes = 0
+		self.state_writes = 0
+		# State write requests merged into another write of the same entity
+		self.coalesced_state_writes = 0
+		self._inbound_rate = RollingCounter()
+		self._outbound_rate = RollingCounter()
+		self._latencies = deque(maxlen=LATENCY_SAMPLES)
+		# category -> wall clock timestamps of the most recent messages
+		self._recent = {}
+		self.receive_to_state_write = LatencyHistogram()
+		self.service_to_publish = LatencyHistogram()
+		self.unlock_to_relock = LatencyHistogram()
+		self.relocks = 0
+		self.relock_attempts = 0
+		self.last_relock_ms = None
+		# command kind -> LatencyHistogram of command-to-confirming-state times
+		self.command_round_trip = {}
+		self.commands_confirmed = 0
+		self.commands_retried = 0
+		self.commands_expired = 0
+		self.commands_merged = 0
+		self.commands_skipped = 0
+		self.last_command_rtt_ms = None
+
+	@property
+	def inbound_total(self):
+		"""Return the number of messages received on all topics."""
+		return sum(self.inbound.values())
+
+	def record_inbound(self, category):
+		"""Count a message received for this device."""
+		self.inbound[category] = self.inbound.get(category, 0) + 1
+		self._inbound_rate.add()
+		recent = self._recent.get(category)
+		if recent is None:
+			recent = self._recent[category] = deque(maxlen=RECENT_MESSAGES)
+		recent.append(time.time())
+
+	def record_outbound(self):
+		"""Count a message published for this device."""
+		self.outbound += 1
+		self._outbound_rate.add()
+
+	def record_dropped(self):
+		"""Count a message that was dropped or suppressed."""
+		self.dropped += 1
+
+	def record_echo(self):
+		"""Count a dropped message that was the echo of our own publish."""
+		self.record_dropped()
+		self.suppressed_echoes += 1
+
+	@property
+	def undecodable(self):
+		"""Return the number of dropped messages whose payload could not be decoded."""
+		return self.dropped - self.suppressed_echoes
+
+	def record_state_writes(self, count, coalesced=0):
+		"""Count entity state writes and the write requests merged into them."""
+		self.state_writes += count
+		self.coalesced_state_writes += coalesced
+
+	def record_latency(self, seconds):
+		"""Record how long a message handler took."""
+		self._latencies.append(seconds)
+
+	def record_relock(self, seconds, attempts):
+		"""Record an enforced relock: time from the unlock report to the lock report."""
+		self.unlock_to_relock.record(seconds)
+		self.relocks += 1
+		self.relock_attempts += attempts
+		self.last_relock_ms = round(seconds * 1000, 1)
+
+	def record_command_ack(self, kind, seconds):
+		"""Record a command confirmed by HASS.Agent, timed from its first send."""
+		histogram = self.command_round_trip.get(kind)
+		if histogram is None:
+			histogram = self.command_round_trip[kind] = LatencyHistogram()
+		histogram.record(seconds)
+		self.commands_confirmed += 1
+		self.last_command_rtt_ms = round(seconds * 1000, 1)
+
+	def record_command_retry(self):
+		"""Count a command sent again because it was not confirmed."""
+		self.commands_retried += 1
+
+	def record_command_expired(self):
+		"""Count a command that was never confirmed."""
+		self.commands_expired += 1
+
+	def record_command_merged(self):
+		"""Count a command request merged into one already in flight."""
+		self.commands_merged += 1
+
+	def record_command_skipped(self):
+		"""Count a command not sent because the computer is already in that state."""
+		self.commands_skipped += 1
+
+	def inbound_per_minute(self):
+		"""Return the rolling inbound message rate."""
+		return self._inbound_rate.per_minute()
+
+	def outbound_per_minute(self):
+		"""Return the rolling outbound publish rate."""
+		return self._outbound_rate.per_minute()
+
+	def latency_percentile(self, percentile):
+		"""Return a handler latency percentile in milliseconds, or None without samples."""
+		if not self._latencies:
+			return None
+		samples = sorted(self._latencies)
+		index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+		return round(samples[index] * 1000, 2)
+
+	def as_diagnostics(self):
+		"""Return a JSON-serialisable snapshot for config entry diagnostics."""
+		return {
+			"inbound": dict(self.inbound),
+			"inbound_per_minute": round(self.inbound_per_minute(), 1),
+			"outbound": self.outbound,
+			"outbound_per_minute": round(self.outbound_per_minute(), 1),
+			"dropped": self.dropped,
+			"suppressed_echoes": self.suppressed_echoes,
+			"undecodable": self.undecodable,
+			"state_writes": self.state_writes,
+			"coalesced_state_writes": self.coalesced_state_writes,
+			"handler_latency_ms": {
+				"p50": self.latency_percentile(50),
+				"p95": self.latency_percentile(95),
+				"p99": self.latency_percentile(99),
+			},
+			"recent_messages": {
+				category: [
+					datetime.fromtimestamp(stamp, timezone.utc).isoformat()
+					for stamp in stamps
+				]
+				for category, stamps in self._recent.items()
+			},
+			"relocks": self.relocks,
+			"relock_attempts": self.relock_attempts,
+			"commands": {
+				"confirmed": self.commands_confirmed,
+				"retried": self.commands_retried,
+				"expired": self.commands_expired,
+				"merged": self.commands_merged,
+				"skipped": self.commands_skipped,
+			},
+			"latency_histograms": {
+				"mqtt_receive_to_state_write": self.receive_to_state_write.as_dict(),
+				"service_call_to_publish": self.service_to_publish.as_dict(),
+				"unlock_to_relock": self.unlock_to_relock.as_dict(),
+				**{
+					f"{kind}_command_to_state": histogram.as_dict()
+					for kind, histogram in self.command_round_trip.items()
+				},
+			},
+		}
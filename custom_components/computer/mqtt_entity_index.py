@@ -0,0 +1,143 @@
+"""Index of the MQTT entities HASS.Agent creates, keyed by their device."""
+import logging
+
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+MQTT_PLATFORM = "mqtt"
+
+
+def async_get_mqtt_entity_index(hass):
+	"""Return the integration-wide MQTT entity index, building it on first use."""
+	domain_data = hass.data.setdefault(DOMAIN, {})
+	index = domain_data.get("mqtt_entity_index")
+	if index is None:
+		index = domain_data["mqtt_entity_index"] = MqttEntityIndex(hass)
+	return index
+
+
+def _device_keys(device):
+	"""Return the keys a HASS.Agent device is looked up by.
+
+	HASS.Agent names its MQTT device after the computer, so the lowercased
+	device name and identifiers are matched exactly against the name of a
+	computer. Identifiers of our own devices are left out.
+	"""
+	keys = {
+		str(identifier).lower() for domain, identifier in device.identifiers if domain != DOMAIN
+	}
+	if device.name:
+		keys.add(device.name.lower())
+	return keys
+
+
+class MqttEntityIndex:
+	"""Map HASS.Agent device names to their MQTT entity registry entries.
+
+	MQTT entities are grouped by the registry device they belong to, and
+	those devices are indexed by their name and identifiers, so a computer
+	only ever gets the entities of the MQTT device carrying its exact name.
+	The registries are scanned once; after that the index follows entity
+	and device registry update events, so associating a computer with its
+	MQTT entities is a few dict lookups instead of a scan per entry.
+	"""
+
+	def __init__(self, hass):
+		"""Initialize the index from the entity registry."""
+		self.hass = hass
+		# entity_id -> device_id of every MQTT entity with a device
+		self._entities = {}
+		# device_id -> set of entity_ids
+		self._by_device = {}
+		# device_id -> keys it is indexed under
+		self._device_keys = {}
+		# key -> set of device_ids
+		self._by_key = {}
+		registry = er.async_get(hass)
+		for entry in registry.entities.values():
+			self._add(entry)
+		self._unsubs = [
+			hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated),
+			hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated),
+		]
+		_LOGGER.debug("Indexed MQTT entities of %d devices", len(self._by_device))
+
+	def async_lookup(self, device_name):
+		"""Return the entity_ids of the MQTT entities of a HASS.Agent device."""
+		entity_ids = set()
+		for device_id in self._by_key.get(device_name.lower(), ()):
+			entity_ids.update(self._by_device[device_id])
+		return entity_ids
+
+	def async_close(self):
+		"""Stop following the registries."""
+		for unsub in self._unsubs:
+			unsub()
+		self._unsubs = []
+
+	def _add(self, entry):
+		"""Index an MQTT entity registry entry under its device."""
+		if entry.platform != MQTT_PLATFORM or entry.device_id is None:
+			return
+		self._entities[entry.entity_id] = entry.device_id
+		entity_ids = self._by_device.get(entry.device_id)
+		if entity_ids is None:
+			entity_ids = self._by_device[entry.device_id] = set()
+			self._index_device(entry.device_id)
+		entity_ids.add(entry.entity_id)
+
+	def _remove(self, entity_id):
+		"""Drop an entity_id from the index."""
+		device_id = self._entities.pop(entity_id, None)
+		if device_id is None:
+			return
+		entity_ids = self._by_device[device_id]
+		entity_ids.discard(entity_id)
+		if not entity_ids:
+			del self._by_device[device_id]
+			self._unindex_device(device_id)
+
+	def _index_device(self, device_id):
+		"""Index a device under its name and identifiers."""
+		device = dr.async_get(self.hass).async_get(device_id)
+		keys = _device_keys(device) if device is not None else set()
+		self._device_keys[device_id] = keys
+		for key in keys:
+			self._by_key.setdefault(key, set()).add(device_id)
+
+	def _unindex_device(self, device_id):
+		"""Drop a device from the key index."""
+		for key in self._device_keys.pop(device_id, ()):
+			device_ids = self._by_key.get(key)
+			if device_ids is None:
+				continue
+			device_ids.discard(device_id)
+			if not device_ids:
+				del self._by_key[key]
+
+	@callback
+	def _async_entity_registry_updated(self, event):
+		"""Keep the index in step with the entity registry."""
+		action = event.data["action"]
+		entity_id = event.data["entity_id"]
+		self._remove(event.data.get("old_entity_id", entity_id))
+		if action == "remove":
+			return
+		entry = er.async_get(self.hass).async_get(entity_id)
+		if entry is not None:
+			self._add(entry)
+
+	@callback
+	def _async_device_registry_updated(self, event):
+		"""Re-key a device whose name or identifiers changed."""
+		device_id = event.data["device_id"]
+		if device_id not in self._by_device:
+			return
+		self._unindex_device(device_id)
+		if event.data["action"] != "remove":
+			self._index_device(device_id)
@@ -0,0 +1,187 @@
+"""Shared MQTT subscription and topic routing for all Computer devices."""
+import asyncio
+from functools import partial
+import logging
+import time
+
+from homeassistant.components import mqtt
+
+from .const import DOMAIN, MQTT_BASE_TOPIC, MQTT_SUBSCRIBE_TIMEOUT
+from .inbound import InboundQueues
+
+_LOGGER = logging.getLogger(__name__)
+
+# One wildcard subscription covers the HASS.Agent sensors of every computer:
+#   homeassistant/sensor/<device>/<device>_<sensor>/state
+#   homeassistant/sensor/<device>/availability
+SENSOR_STATE_TOPIC = f"{MQTT_BASE_TOPIC}/sensor/+/+/state"
+AVAILABILITY_TOPIC = f"{MQTT_BASE_TOPIC}/sensor/+/availability"
+
+# Handler key used for the availability topic
+SUFFIX_AVAILABILITY = "availability"
+
+
+def async_get_router(hass):
+	"""Return the integration-wide MQTT router, creating it on first use."""
+	domain_data = hass.data.setdefault(DOMAIN, {})
+	router = domain_data.get("router")
+	if router is None:
+		router = domain_data["router"] = MqttRouter(hass)
+	return router
+
+
+class MqttRouter:
+	"""Route HASS.Agent sensor messages for all computers from one subscription.
+
+	Each device registers a table of sensor suffix -> handler. The table is
+	precompiled into object_id -> handler (e.g. "MyPC_activewindow") so a
+	message is dispatched with two dict lookups regardless of fleet size.
+	Handlers run from per-device inbound queues, so a noisy computer does
+	not hold up the messages of the others.
+	"""
+
+	def __init__(self, hass):
+		"""Initialize the router."""
+		self.hass = hass
+		# device name (case preserved) -> {object_id or "availability": handler}
+		self._routes = {}
+		# topic -> unsubscribe callback for completed subscriptions
+		self._subscriptions = {}
+		# topic -> task for subscriptions still in flight after the deadline
+		self._pending = {}
+		self._lock = asyncio.Lock()
+		self._inbound = InboundQueues(hass)
+
+	@property
+	def subscribed_topics(self):
+		"""Return the wildcard topics currently subscribed."""
+		return list(self._subscriptions)
+
+	def async_get_diagnostics(self, device_name):
+		"""Return the subscription and routing state for a device."""
+		return {
+			"subscribed": self.subscribed_topics,
+			"pending": list(self._pending),
+			"device_registered": device_name in self._routes,
+			"routes": sorted(self._routes.get(device_name, {})),
+			"devices_routed": len(self._routes),
+			"inbound": self._inbound.as_diagnostics(device_name),
+		}
+
+	async def async_register_device(self, device_name, handlers):
+		"""Register sensor handlers for a device and return an unregister callback.
+
+		handlers maps a HASS.Agent sensor suffix (e.g. "activewindow") or
+		SUFFIX_AVAILABILITY to an async callable taking the MQTT message and
+		the monotonic time it was received.
+		"""
+		routes = {}
+		for suffix, handler in handlers.items():
+			if suffix == SUFFIX_AVAILABILITY:
+				routes[SUFFIX_AVAILABILITY] = handler
+			else:
+				routes[f"{device_name}_{suffix}"] = handler
+		self._routes[device_name] = routes
+
+		failed = await self._async_ensure_subscribed()
+		if failed:
+			_LOGGER.warning(
+				"Computer %s registered while %d MQTT subscription(s) are still incomplete: %s",
+				device_name, len(failed), ", ".join(failed)
+			)
+
+		def unregister():
+			"""Stop routing messages for this device."""
+			if self._routes.get(device_name) is routes:
+				del self._routes[device_name]
+				self._inbound.forget(device_name)
+			if not self._routes:
+				self._async_unsubscribe()
+
+		return unregister
+
+	async def _async_ensure_subscribed(self):
+		"""Subscribe to any wildcard topic we are not subscribed to yet.
+
+		All subscriptions are issued concurrently and share one deadline. A
+		topic that misses the deadline keeps subscribing in the background
+		instead of failing setup. Returns topic -> reason for every topic that
+		is not subscribed when the deadline passes.
+		"""
+		async with self._lock:
+			missing = [
+				topic for topic in (SENSOR_STATE_TOPIC, AVAILABILITY_TOPIC)
+				if topic not in self._subscriptions and topic not in self._pending
+			]
+			if not missing:
+				return {}
+
+			_LOGGER.debug("Subscribing to %s", ", ".join(missing))
+			tasks = {
+				topic: self.hass.async_create_task(
+					mqtt.async_subscribe(self.hass, topic, self._message_received)
+				)
+				for topic in missing
+			}
+			_, pending = await asyncio.wait(tasks.values(), timeout=MQTT_SUBSCRIBE_TIMEOUT)
+
+			failed = {}
+			for topic, task in tasks.items():
+				if task in pending:
+					failed[topic] = f"no response within {MQTT_SUBSCRIBE_TIMEOUT} s"
+					self._pending[topic] = task
+					task.add_done_callback(partial(self._late_subscription_done, topic))
+				elif task.exception() is not None:
+					failed[topic] = str(task.exception())
+				else:
+					self._subscriptions[topic] = task.result()
+
+			for topic, reason in failed.items():
+				_LOGGER.error("MQTT subscription to %s failed: %s", topic, reason)
+			return failed
+
+	def _late_subscription_done(self, topic, task):
+		"""Store a subscription that completed after the setup deadline."""
+		if self._pending.get(topic) is task:
+			del self._pending[topic]
+		if task.cancelled():
+			return
+		if task.exception() is not None:
+			_LOGGER.error("MQTT subscription to %s failed: %s", topic, task.exception())
+			return
+
+		unsubscribe = task.result()
+		if not self._routes:
+			# Every device went away while we were waiting
+			unsubscribe()
+			return
+		self._subscriptions[topic] = unsubscribe
+		_LOGGER.info("MQTT subscription to %s completed after the setup deadline", topic)
+
+	def _async_unsubscribe(self):
+		"""Drop the wildcard subscriptions once no device is registered."""
+		_LOGGER.debug("No computers left, unsubscribing from HASS.Agent topics")
+		for task in self._pending.values():
+			task.cancel()
+		self._pending = {}
+		for unsubscribe in self._subscriptions.values():
+			unsubscribe()
+		self._subscriptions = {}
+
+	async def _message_received(self, msg):
+		"""Queue a message for the handler of the device it belongs to."""
+		received = time.monotonic()
+		parts = msg.topic.split("/")
+		routes = self._routes.get(parts[2]) if len(parts) > 3 else None
+		if routes is None:
+			return
+
+		if len(parts) == 5:
+			handler = routes.get(parts[3])
+		elif parts[3] == SUFFIX_AVAILABILITY:
+			handler = routes.get(SUFFIX_AVAILABILITY)
+		else:
+			handler = None
+
+		if handler is not None:
+			self._inbound.submit(parts[2], handler, msg, received)
@@ -0,0 +1,8 @@
+"""Number platform for the Computer integration (volume)."""
+from .const import DOMAIN
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+	"""Add the volume entity of a Computer."""
+	entities = hass.data[DOMAIN]["entities"][entry.entry_id]
+	async_add_entities([entities["volume"]])
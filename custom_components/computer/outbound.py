@@ -0,0 +1,142 @@
+"""Prioritised outbound MQTT publishing shared by all computers."""
+from collections import deque
+import logging
+
+from homeassistant.components import mqtt
+
+from .const import DOMAIN, OUTBOUND_LANE_SIZE
+from .metrics import LatencyHistogram
+
+_LOGGER = logging.getLogger(__name__)
+
+# Lanes, highest priority first
+LANE_SECURITY = "security"  # lock commands
+LANE_POWER = "power"  # power changes
+LANE_COMMAND = "command"  # volume, mute and refresh commands
+LANE_STATE = "state"  # state mirrored to the update and sensor topics
+LANES = (LANE_SECURITY, LANE_POWER, LANE_COMMAND, LANE_STATE)
+
+
+def async_get_outbound(hass):
+	"""Return the integration-wide outbound publisher, creating it on first use."""
+	domain_data = hass.data.setdefault(DOMAIN, {})
+	outbound = domain_data.get("outbound")
+	if outbound is None:
+		outbound = domain_data["outbound"] = OutboundPublisher(hass)
+	return outbound
+
+
+def _resolve(sent, result):
+	"""Tell a sender waiting for its message whether it went out."""
+	if sent is not None and not sent.done():
+		sent.set_result(result)
+
+
+class _Lane:
+	"""Queue and statistics of one priority lane."""
+
+	__slots__ = ("queue", "max_size", "latency", "published", "dropped", "failed", "peak")
+
+	def __init__(self, max_size):
+		"""Initialize the lane."""
+		# (topic, payload, retain, loop time queued, drop callback or None,
+		#  future resolved once sent or None)
+		self.queue = deque()
+		self.max_size = max_size
+		# Time from queueing to the broker accepting the publish
+		self.latency = LatencyHistogram()
+		self.published = 0
+		self.dropped = 0
+		self.failed = 0
+		self.peak = 0
+
+
+class OutboundPublisher:
+	"""Publish MQTT messages for all computers in priority order.
+
+	Publishes are queued on a lane and return straight away; one task sends
+	them, always taking the next message from the highest priority lane that
+	has one. A lock command therefore waits for at most the publish in
+	progress, however much volume or state traffic is queued behind it.
+	Messages on one lane are sent in order. When a message is queued on a
+	lane while lower lanes still hold messages for the same topic, those go
+	first so a topic never sees an older payload after a newer one.
+
+	Each lane holds at most `max_size` messages; when it is full the oldest
+	is dropped and its drop callback, if any, is called with the topic so
+	the sender can republish it in full later. A sender that needs to know
+	when its message has gone out can ask publish() for a future.
+	"""
+
+	def __init__(self, hass, max_size=OUTBOUND_LANE_SIZE):
+		"""Initialize the publisher."""
+		self.hass = hass
+		self._lanes = {lane: _Lane(max_size) for lane in LANES}
+		# Set before the drain task is created, as it may run to completion
+		# straight away when tasks start eagerly
+		self._draining = False
+
+	def publish(self, topic, payload, retain=False, lane=LANE_STATE, on_drop=None, wait=False):
+		"""Queue a message for publishing.
+
+		With wait, returns a future that is resolved with True once the
+		broker has accepted the message, or False if it was dropped or
+		failed to publish.
+		"""
+		target = self._lanes[lane]
+		for lower in LANES[LANES.index(lane) + 1:]:
+			queue = self._lanes[lower].queue
+			if any(item[0] == topic for item in queue):
+				target.queue.extend(item for item in queue if item[0] == topic)
+				self._lanes[lower].queue = deque(item for item in queue if item[0] != topic)
+
+		while len(target.queue) >= target.max_size:
+			dropped = target.queue.popleft()
+			target.dropped += 1
+			_LOGGER.warning("Outbound %s lane is full, dropping the message for %s", lane, dropped[0])
+			if dropped[4] is not None:
+				dropped[4](dropped[0])
+			_resolve(dropped[5], False)
+		sent = self.hass.loop.create_future() if wait else None
+		target.queue.append((topic, payload, retain, self.hass.loop.time(), on_drop, sent))
+		target.peak = max(target.peak, len(target.queue))
+
+		if not self._draining:
+			self._draining = True
+			self.hass.async_create_task(self._async_drain())
+		return sent
+
+	def as_diagnostics(self):
+		"""Return the lane statistics for config entry diagnostics."""
+		return {
+			name: {
+				"queued": len(lane.queue),
+				"peak": lane.peak,
+				"published": lane.published,
+				"dropped": lane.dropped,
+				"failed": lane.failed,
+				"latency": lane.latency.as_dict(),
+			}
+			for name, lane in self._lanes.items()
+		}
+
+	async def _async_drain(self):
+		"""Send queued messages, highest priority lane first, until all are sent."""
+		try:
+			while True:
+				lane = next((lane for lane in self._lanes.values() if lane.queue), None)
+				if lane is None:
+					return
+				topic, payload, retain, queued_at, _, sent = lane.queue.popleft()
+				try:
+					await mqtt.async_publish(self.hass, topic, payload, retain=retain)
+				except Exception as e:
+					lane.failed += 1
+					_LOGGER.error("Failed to publish to %s: %s", topic, e)
+					_resolve(sent, False)
+					continue
+				lane.published += 1
+				lane.latency.record(self.hass.loop.time() - queued_at)
+				_resolve(sent, True)
+		finally:
+			self._draining = False
@@ -0,0 +1,108 @@
+"""Store-and-forward queue for commands to an offline computer."""
+import logging
+
+from .const import OFFLINE_QUEUE_SIZE
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CommandOutbox:
+	"""Hold commands while a computer is offline and send them when it is back.
+
+	Commands are collapsed per topic, so the outbox keeps one intent per
+	command: the latest volume, a single lock press and, because the HASS.Agent
+	mute button toggles, a mute press only if an odd number of them arrived.
+	Commands are flushed in the order they were last given. A command older
+	than `ttl` seconds is dropped instead of being sent late, and at most
+	`max_size` commands are held; the oldest gives way when it is full.
+	"""
+
+	def __init__(self, hass, publish, ttl, name, max_size=OFFLINE_QUEUE_SIZE):
+		"""Initialize the outbox.
+
+		publish is the device's async_publish(topic, payload, retain, lane).
+		"""
+		self.hass = hass
+		self._publish = publish
+		self._ttl = ttl
+		self._name = name
+		self._max_size = max_size
+		# topic -> (payload, outbound lane, loop time it was given), in the order to send
+		self._held = {}
+		self.held = 0
+		self.collapsed = 0
+		self.expired = 0
+		self.overflowed = 0
+		self.flushed = 0
+
+	def __len__(self):
+		"""Return the number of commands held."""
+		return len(self._held)
+
+	def configure(self, ttl):
+		"""Change how long commands are held; 0 stops holding them."""
+		self._ttl = ttl
+		if not ttl:
+			self.clear()
+
+	def hold(self, topic, payload, lane, toggle=False):
+		"""Hold a command until the computer is back online.
+
+		toggle marks a command whose second press undoes the first.
+		Returns False if holding is disabled and the command should be sent.
+		"""
+		if not self._ttl:
+			return False
+		self.held += 1
+		previous = self._held.pop(topic, None)
+		if previous is not None:
+			self.collapsed += 1
+			if toggle:
+				_LOGGER.debug("Two %s presses for offline %s cancel out", topic, self._name)
+				return True
+		elif len(self._held) >= self._max_size:
+			dropped = next(iter(self._held))
+			del self._held[dropped]
+			self.overflowed += 1
+			_LOGGER.warning("Outbox of %s is full, dropping the command for %s", self._name, dropped)
+		self._held[topic] = (payload, lane, self.hass.loop.time())
+		_LOGGER.debug("Computer %s is offline, holding the command for %s", self._name, topic)
+		return True
+
+	def clear(self):
+		"""Drop every held command."""
+		self._held.clear()
+
+	async def async_flush(self):
+		"""Send the held commands that have not expired, in order."""
+		held, self._held = self._held, {}
+		if not held:
+			return
+		deadline = self.hass.loop.time() - self._ttl
+		sent = 0
+		for topic, (payload, lane, given) in held.items():
+			if given < deadline:
+				self.expired += 1
+				continue
+			try:
+				await self._publish(topic, payload, lane=lane)
+			except Exception as e:
+				_LOGGER.error("Failed to publish held command to %s: %s", topic, e)
+				continue
+			sent += 1
+		self.flushed += sent
+		_LOGGER.info(
+			"Computer %s is back online, sent %d held command(s), dropped %d",
+			self._name, sent, len(held) - sent
+		)
+
+	def as_diagnostics(self):
+		"""Return the outbox state for config entry diagnostics."""
+		return {
+			"holding": len(self._held),
+			"held": self.held,
+			"collapsed": self.collapsed,
+			"expired": self.expired,
+			"overflowed": self.overflowed,
+			"flushed": self.flushed,
+		}
@@ -0,0 +1,255 @@
+"""Shared scheduler for HASS.Agent full sensor refreshes."""
+import logging
+import random
+
+from .const import (
+	DOMAIN, REFRESH_JITTER, REFRESH_MAX_IN_FLIGHT, REFRESH_REPLY_TIMEOUT,
+	REFRESH_STALE_AFTER, REFRESH_CHECK_INTERVAL, REFRESH_BACKOFF_BASE, REFRESH_BACKOFF_MAX
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def async_get_refresh_scheduler(hass):
+	"""Return the integration-wide refresh scheduler, creating it on first use."""
+	domain_data = hass.data.setdefault(DOMAIN, {})
+	scheduler = domain_data.get("refresh")
+	if scheduler is None:
+		scheduler = domain_data["refresh"] = RefreshScheduler(hass)
+	return scheduler
+
+
+class _TrackedDevice:
+	"""Background refresh state of one computer."""
+
+	__slots__ = ("send", "sensors", "last_seen", "failures", "retry_at")
+
+	def __init__(self, send, now):
+		"""Initialize the state; the device counts as just seen."""
+		self.send = send
+		# sensor category -> loop time of its last message
+		self.sensors = {}
+		self.last_seen = now
+		# Consecutive requests without a reply (or offline reports)
+		self.failures = 0
+		self.retry_at = None
+
+
+class RefreshScheduler:
+	"""Spread publishallsensors requests for all computers over time.
+
+	Requests are queued and started after a random delay of up to `jitter`
+	seconds, with at most `max_in_flight` outstanding at once. A request is
+	complete when the first sensor message from that computer arrives (or
+	after `timeout` seconds without one), which frees its slot for the next
+	computer. A computer that reports in before its request is sent is not
+	asked at all. Once the queue drains, the time it took to hear from every
+	computer is logged and kept for diagnostics.
+
+	Tracked computers are also refreshed in the background: one timer checks
+	every `check_interval` seconds for computers that have sent nothing for
+	`stale_after` seconds and requests a refresh for those only. A computer
+	that does not reply, or reports itself offline, is retried with
+	exponential backoff instead.
+	"""
+
+	def __init__(
+		self, hass, jitter=REFRESH_JITTER, max_in_flight=REFRESH_MAX_IN_FLIGHT,
+		timeout=REFRESH_REPLY_TIMEOUT, stale_after=REFRESH_STALE_AFTER,
+		check_interval=REFRESH_CHECK_INTERVAL
+	):
+		"""Initialize the scheduler."""
+		self.hass = hass
+		self._jitter = jitter
+		self._max_in_flight = max(1, max_in_flight)
+		self._timeout = timeout
+		self._stale_after = stale_after
+		self._check_interval = check_interval
+		# device name -> _TrackedDevice for background refresh
+		self._tracked = {}
+		self._check_handle = None
+		# device name -> async callable sending the request, in request order
+		self._queued = {}
+		# device name -> [timer handle, loop time the request was sent or None]
+		self._in_flight = {}
+		# Loop time the current batch of requests started
+		self._batch_started = None
+		self._batch_size = 0
+		self._batch_timeouts = 0
+		# device name -> seconds from request to first reply, for the last batch
+		self.reply_times = {}
+		self.timeouts = 0
+		self.background_requests = 0
+		self.last_populated_in = None
+
+	def configure(self, jitter, max_in_flight, timeout, stale_after):
+		"""Change the scheduling parameters."""
+		self._jitter = jitter
+		self._max_in_flight = max(1, max_in_flight)
+		self._timeout = timeout
+		self._stale_after = stale_after
+		self._pump()
+
+	def track(self, device_name, send):
+		"""Refresh a device in the background when it goes quiet.
+
+		Returns a callback that stops tracking the device.
+		"""
+		tracked = _TrackedDevice(send, self.hass.loop.time())
+		self._tracked[device_name] = tracked
+		if self._check_handle is None and self._stale_after:
+			self._check_handle = self.hass.loop.call_later(self._check_interval, self._check)
+
+		def untrack():
+			"""Stop tracking the device."""
+			if self._tracked.get(device_name) is tracked:
+				del self._tracked[device_name]
+			self.cancel(device_name)
+			if not self._tracked and self._check_handle is not None:
+				self._check_handle.cancel()
+				self._check_handle = None
+
+		return untrack
+
+	def seen(self, device_name, sensor):
+		"""Note that a sensor message arrived from a device."""
+		tracked = self._tracked.get(device_name)
+		if tracked is not None:
+			now = self.hass.loop.time()
+			tracked.sensors[sensor] = tracked.last_seen = now
+			tracked.failures = 0
+			tracked.retry_at = None
+		self.reply(device_name)
+
+	def set_available(self, device_name, available):
+		"""Note an availability report; offline devices are only retried with backoff."""
+		tracked = self._tracked.get(device_name)
+		if tracked is None:
+			return
+		if available:
+			tracked.failures = 0
+			tracked.retry_at = None
+		elif not tracked.failures:
+			self._back_off(tracked)
+
+	def request(self, device_name, send):
+		"""Queue a full sensor refresh for a device.
+
+		send is an async callable that publishes the request.
+		"""
+		if device_name in self._queued or device_name in self._in_flight:
+			return
+		if self._batch_started is None:
+			self._batch_started = self.hass.loop.time()
+			self._batch_size = 0
+			self._batch_timeouts = 0
+			self.reply_times = {}
+		self._batch_size += 1
+		self._queued[device_name] = send
+		self._pump()
+
+	def reply(self, device_name):
+		"""Note that a sensor message arrived from a device."""
+		if device_name in self._in_flight:
+			slot = self._in_flight.pop(device_name)
+			slot[0].cancel()
+			if slot[1] is not None:
+				self.reply_times[device_name] = round(self.hass.loop.time() - slot[1], 3)
+		elif self._queued.pop(device_name, None) is None:
+			return
+		self._pump()
+
+	def cancel(self, device_name):
+		"""Forget any refresh queued or in flight for a device."""
+		slot = self._in_flight.pop(device_name, None)
+		if slot is not None:
+			slot[0].cancel()
+		self._queued.pop(device_name, None)
+		self._pump()
+
+	def as_diagnostics(self, device_name=None):
+		"""Return the scheduler state for config entry diagnostics."""
+		diagnostics = {
+			"queued": len(self._queued),
+			"in_flight": len(self._in_flight),
+			"timeouts": self.timeouts,
+			"background_requests": self.background_requests,
+			"last_populated_in_s": self.last_populated_in,
+			"reply_times_s": dict(self.reply_times),
+		}
+		tracked = self._tracked.get(device_name)
+		if tracked is not None:
+			now = self.hass.loop.time()
+			diagnostics["device"] = {
+				"age_s": round(now - tracked.last_seen, 1),
+				"sensor_age_s": {
+					sensor: round(now - seen, 1) for sensor, seen in tracked.sensors.items()
+				},
+				"failures": tracked.failures,
+				"retry_in_s": round(tracked.retry_at - now, 1) if tracked.retry_at else None,
+			}
+		return diagnostics
+
+	def _check(self):
+		"""Request a refresh for every tracked device that has gone quiet."""
+		self._check_handle = None
+		if not self._tracked or not self._stale_after:
+			return
+		now = self.hass.loop.time()
+		for device_name, tracked in self._tracked.items():
+			if tracked.failures:
+				due = tracked.retry_at
+			else:
+				due = tracked.last_seen + self._stale_after
+			if now >= due and device_name not in self._queued and device_name not in self._in_flight:
+				_LOGGER.debug(
+					"No sensor update from %s for %.0f s, requesting one",
+					device_name, now - tracked.last_seen
+				)
+				self.background_requests += 1
+				self.request(device_name, tracked.send)
+		self._check_handle = self.hass.loop.call_later(self._check_interval, self._check)
+
+	def _back_off(self, tracked):
+		"""Count a failure and push the next retry out exponentially."""
+		tracked.failures += 1
+		delay = min(REFRESH_BACKOFF_BASE * 2 ** (tracked.failures - 1), REFRESH_BACKOFF_MAX)
+		tracked.retry_at = self.hass.loop.time() + delay
+
+	def _pump(self):
+		"""Start queued requests while there is a free slot."""
+		while self._queued and len(self._in_flight) < self._max_in_flight:
+			device_name = next(iter(self._queued))
+			send = self._queued.pop(device_name)
+			delay = random.uniform(0, self._jitter) if self._jitter else 0
+			handle = self.hass.loop.call_later(delay, self._send, device_name, send)
+			self._in_flight[device_name] = [handle, None]
+
+		if not self._queued and not self._in_flight and self._batch_started is not None:
+			self.last_populated_in = round(self.hass.loop.time() - self._batch_started, 3)
+			self._batch_started = None
+			_LOGGER.info(
+				"Sensor update requests for %d computer(s) completed in %.1f s (%d without reply)",
+				self._batch_size, self.last_populated_in, self._batch_timeouts
+			)
+
+	def _send(self, device_name, send):
+		"""Send the request once its jitter delay has passed."""
+		slot = self._in_flight.get(device_name)
+		if slot is None:
+			return
+		slot[0] = self.hass.loop.call_later(self._timeout, self._expire, device_name)
+		slot[1] = self.hass.loop.time()
+		self.hass.async_create_task(send())
+
+	def _expire(self, device_name):
+		"""Give up waiting for a device that did not reply."""
+		if self._in_flight.pop(device_name, None) is None:
+			return
+		self.timeouts += 1
+		self._batch_timeouts += 1
+		_LOGGER.debug("No reply from %s within %s s of requesting sensor updates", device_name, self._timeout)
+		tracked = self._tracked.get(device_name)
+		if tracked is not None:
+			self._back_off(tracked)
+		self._pump()
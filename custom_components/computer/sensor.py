@@ -0,0 +1,11 @@
+"""Sensor platform for the Computer integration (active window, session state, metrics)."""
+from .const import DOMAIN
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+	"""Add the sensor entities of a Computer, including its diagnostic metric sensors."""
+	entities = hass.data[DOMAIN]["entities"][entry.entry_id]
+	async_add_entities([
+		entity for role, entity in entities.items()
+		if role in ("active_window", "session_state") or role.startswith("metric_")
+	])
@@ -0,0 +1,37 @@
+"""Combined state document for a Computer device."""
+import json
+
+try:
+	import orjson
+except ImportError:  # Optional; Home Assistant normally ships it
+	orjson = None
+
+# Version of the combined state document. Bump it when a field is renamed or
+# changes meaning; new fields can be added without a bump and consumers
+# should ignore fields they do not know.
+STATE_SCHEMA_VERSION = 1
+
+if orjson is not None:
+	def dumps(obj):
+		"""Serialise obj to compact JSON."""
+		return orjson.dumps(obj).decode("utf-8")
+else:
+	dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def build_state_document(state, volume_level, active_window, session_state, muted, enforce_lock):
+	"""Return the combined state document of a computer.
+
+	Keys are kept short for small MQTT clients:
+	v: schema version, s: "on"/"off", vol: volume percent, win: active window,
+	ses: session state, mute: muted, lock: enforce lock active.
+	"""
+	return {
+		"v": STATE_SCHEMA_VERSION,
+		"s": state,
+		"vol": round(volume_level * 100),
+		"win": active_window,
+		"ses": session_state,
+		"mute": muted,
+		"lock": enforce_lock,
+	}
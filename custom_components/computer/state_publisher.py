@@ -0,0 +1,118 @@
+"""Change-only state publishing for a Computer device."""
+import logging
+
+from .outbound import LANE_STATE
+from .state_document import dumps
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StatePublisher:
+	"""Publish a device's state, sending only what changed since the last publish.
+
+	The last payload on each HASS.Agent sensor topic is remembered, including
+	payloads received from HASS.Agent itself, and unchanged values are not
+	published again. The JSON update document is diffed per field and only
+	carries the fields that changed (plus its key fields). With retain on, the
+	update document is always sent complete so the retained copy gives late
+	subscribers the full picture. invalidate() makes the next publish a full
+	resync.
+	"""
+
+	def __init__(self, publish, echo, retain=False):
+		"""Initialize the publisher.
+
+		publish is an async callable taking (topic, payload, retain, lane).
+		"""
+		self._publish = publish
+		self._echo = echo
+		self._retain = retain
+		# topic -> last payload known to be on the topic
+		self._values = {}
+		# document topic -> fields of the last document published on it
+		self._documents = {}
+		self.published = 0
+		self.skipped = 0
+
+	def configure(self, retain):
+		"""Change the retain flag; the next publish is a full resync."""
+		if retain != self._retain:
+			self._retain = retain
+			self.invalidate()
+
+	def invalidate(self):
+		"""Forget what has been published so everything is sent again."""
+		self._values = {}
+		self._documents = {}
+
+	def mark_published(self, topic, payload):
+		"""Note that payload is already on topic, e.g. because HASS.Agent published it."""
+		self._values[topic] = payload
+
+	async def async_publish_value(self, topic, payload, lane=LANE_STATE):
+		"""Publish a raw value to a HASS.Agent sensor topic unless it is already there.
+
+		The publish is recorded with the echo suppressor first, so the copy the
+		broker delivers back to our own subscription is dropped.
+		"""
+		if self._values.get(topic) == payload:
+			self.skipped += 1
+			return False
+
+		self._echo.record(topic, payload)
+		await self._publish(topic, payload, self._retain, lane)
+		self._values[topic] = payload
+		self.published += 1
+		return True
+
+	async def async_publish_snapshot(self, topic, document, lane=LANE_STATE):
+		"""Publish a complete, retained JSON document if it differs from the last one.
+
+		Raises TypeError or ValueError if the document cannot be serialised.
+		"""
+		payload = dumps(document)
+		if self._values.get(topic) == payload:
+			self.skipped += 1
+			return False
+
+		await self._publish(topic, payload, True, lane)
+		self._values[topic] = payload
+		self.published += 1
+		return True
+
+	def forget(self, topic):
+		"""Forget what was published on topic."""
+		self._values.pop(topic, None)
+		self._documents.pop(topic, None)
+
+	async def async_publish_document(self, topic, document, key_fields=(), lane=LANE_STATE):
+		"""Publish the fields of a JSON document that changed since the last publish.
+
+		key_fields are included in every publish. Raises TypeError or ValueError
+		if the document cannot be serialised.
+		"""
+		last = self._documents.get(topic)
+		if last is None:
+			changed = document
+		else:
+			changed = {
+				field: value for field, value in document.items()
+				if field not in last or last[field] != value
+			}
+		if not changed:
+			self.skipped += 1
+			return False
+
+		if self._retain or changed is document:
+			payload = document
+		else:
+			payload = {field: document[field] for field in key_fields}
+			payload.update(changed)
+		await self._publish(topic, dumps(payload), self._retain, lane)
+		self._documents[topic] = dict(document)
+		self.published += 1
+		_LOGGER.debug(
+			"Published %d changed fields to %s (%d published, %d skipped so far)",
+			len(changed), topic, self.published, self.skipped
+		)
+		return True
@@ -0,0 +1,8 @@
+"""Switch platform for the Computer integration (mute, enforce lock)."""
+from .const import DOMAIN
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+	"""Add the switch entities of a Computer."""
+	entities = hass.data[DOMAIN]["entities"][entry.entry_id]
+	async_add_entities([entities["mute"], entities["enforce_lock"]])
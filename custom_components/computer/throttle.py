@@ -0,0 +1,86 @@
+"""Latest-wins command throttling for the Computer integration."""
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class CommandThrottle:
+	"""Debounce a stream of command values and cap how often they are sent.
+
+	Only the most recent value is ever sent. A value is sent once no new value
+	has arrived for `debounce` seconds (trailing edge), but during a continuous
+	stream, such as a knob sweep, values still go out at up to `max_rate`
+	per second so the target follows the knob. A max_rate of 0 disables the
+	rate limit, and a debounce of 0 sends on the next loop iteration.
+	"""
+
+	def __init__(self, hass, send, debounce, max_rate, name="command"):
+		"""Initialize the throttle.
+
+		send is an async callable taking the value to send.
+		"""
+		self.hass = hass
+		self._send = send
+		self._name = name
+		self._debounce = debounce
+		self._min_interval = 1.0 / max_rate if max_rate else 0.0
+		self._latest = _UNSET
+		self._pending_since = None
+		self._last_sent = None
+		self._handle = None
+		self.submitted = 0
+		self.sent = 0
+
+	def configure(self, debounce, max_rate):
+		"""Change the debounce time and maximum rate."""
+		self._debounce = debounce
+		self._min_interval = 1.0 / max_rate if max_rate else 0.0
+		if self._latest is not _UNSET:
+			self._reschedule()
+
+	def submit(self, value):
+		"""Queue a new target value, replacing any value not sent yet."""
+		self.submitted += 1
+		self._latest = value
+		if self._pending_since is None:
+			self._pending_since = self.hass.loop.time()
+		self._reschedule()
+
+	def cancel(self):
+		"""Drop the pending value without sending it."""
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+		self._latest = _UNSET
+		self._pending_since = None
+
+	def _reschedule(self):
+		"""(Re)arm the timer for the pending value."""
+		now = self.hass.loop.time()
+		due = now + self._debounce
+		if self._min_interval:
+			# Do not hold a value back longer than one rate interval...
+			due = min(due, self._pending_since + self._min_interval)
+			# ...but never send faster than the rate allows
+			if self._last_sent is not None:
+				due = max(due, self._last_sent + self._min_interval)
+
+		if self._handle is not None:
+			self._handle.cancel()
+		self._handle = self.hass.loop.call_at(max(due, now), self._fire)
+
+	def _fire(self):
+		"""Send the latest value."""
+		self._handle = None
+		value, self._latest = self._latest, _UNSET
+		self._pending_since = None
+		if value is _UNSET:
+			return
+		self._last_sent = self.hass.loop.time()
+		self.sent += 1
+		_LOGGER.debug(
+			"Sending %s %s (%d submitted, %d sent)", self._name, value, self.submitted, self.sent
+		)
+		self.hass.async_create_task(self._send(value))
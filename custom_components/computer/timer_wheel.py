@@ -0,0 +1,96 @@
+"""Shared timer wheel for per-device timeouts."""
+import logging
+import math
+
+from .const import DOMAIN, TIMER_WHEEL_RESOLUTION, TIMER_WHEEL_SLOTS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def async_get_timer_wheel(hass):
+	"""Return the integration-wide timer wheel, creating it on first use."""
+	domain_data = hass.data.setdefault(DOMAIN, {})
+	wheel = domain_data.get("timer_wheel")
+	if wheel is None:
+		wheel = domain_data["timer_wheel"] = TimerWheel(hass)
+	return wheel
+
+
+class TimerWheel:
+	"""Hashed timer wheel running many coarse timeouts on a single loop timer.
+
+	Timers are kept in `slots` buckets of `resolution` seconds each; a timer
+	further away than one revolution simply stays in its bucket until its
+	tick comes round. Scheduling and cancelling are O(1) dict operations and
+	the wheel costs one loop callback per tick while any timer is pending,
+	however many timers there are. Timers fire up to `resolution` late.
+	"""
+
+	def __init__(self, hass, resolution=TIMER_WHEEL_RESOLUTION, slots=TIMER_WHEEL_SLOTS):
+		"""Initialize the wheel."""
+		self.hass = hass
+		self._resolution = resolution
+		self._slots = [{} for _ in range(slots)]
+		# key -> tick the timer is due at
+		self._due = {}
+		self._origin = hass.loop.time()
+		# Last tick processed
+		self._tick = self._current_tick()
+		self._handle = None
+
+	def __len__(self):
+		"""Return the number of pending timers."""
+		return len(self._due)
+
+	def schedule(self, key, delay, callback):
+		"""Call callback() after delay seconds, replacing any timer for key."""
+		self.cancel(key)
+		if not self._due:
+			# The wheel was idle; do not replay the ticks it slept through
+			self._tick = self._current_tick()
+		due = max(self._current_tick(), self._tick) + max(1, math.ceil(delay / self._resolution))
+		self._due[key] = due
+		self._slots[due % len(self._slots)][key] = callback
+		if self._handle is None:
+			self._arm()
+
+	def cancel(self, key):
+		"""Cancel the timer for key, if any; the wheel stops once none is left."""
+		due = self._due.pop(key, None)
+		if due is not None:
+			del self._slots[due % len(self._slots)][key]
+			if not self._due and self._handle is not None:
+				self._handle.cancel()
+				self._handle = None
+
+	def _current_tick(self):
+		"""Return the tick number for the current loop time."""
+		return int((self.hass.loop.time() - self._origin) / self._resolution)
+
+	def _arm(self):
+		"""Schedule the next tick."""
+		next_tick_at = self._origin + (self._tick + 1) * self._resolution
+		self._handle = self.hass.loop.call_at(next_tick_at, self._advance)
+
+	def _advance(self):
+		"""Fire every timer due up to now."""
+		self._handle = None
+		now_tick = self._current_tick()
+		# Visiting more than one revolution would only revisit the same slots
+		first = max(self._tick + 1, now_tick - len(self._slots) + 1)
+		fired = []
+		for tick in range(first, now_tick + 1):
+			slot = self._slots[tick % len(self._slots)]
+			for key in [key for key in slot if self._due[key] <= now_tick]:
+				fired.append(slot.pop(key))
+				del self._due[key]
+		self._tick = max(self._tick, now_tick)
+
+		for callback in fired:
+			try:
+				callback()
+			except Exception:
+				_LOGGER.exception("Error in timer callback")
+
+		if self._due and self._handle is None:
+			self._arm()
@@ -0,0 +1,81 @@
+"""Coalesced state writes for a Computer device and its sub-entities."""
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StateWriteCoalescer:
+	"""Collect state write requests and flush each entity at most once per loop tick.
+
+	A single MQTT update typically asks the main entity and several of its
+	sub-entities to write their state, often more than once. Requests made
+	while a flush is pending only mark the entity dirty; the flush then
+	writes every dirty entity exactly once.
+	"""
+
+	def __init__(self, hass, metrics=None):
+		"""Initialize the coalescer."""
+		self.hass = hass
+		self._metrics = metrics
+		# Insertion-ordered set of entities waiting to be written
+		self._dirty = {}
+		self._handle = None
+		# Monotonic time of the earliest MQTT message behind the pending writes
+		self._origin = None
+		self.requested = 0
+		self.flushed = 0
+		# Requests since the last flush
+		self._batch_requested = 0
+
+	@property
+	def saved(self):
+		"""Return how many state writes were avoided by coalescing."""
+		return self.requested - self.flushed - len(self._dirty)
+
+	def mark_origin(self, received):
+		"""Note that the writes scheduled next were caused by a message received at `received`."""
+		if self._origin is None or received < self._origin:
+			self._origin = received
+
+	def schedule(self, *entities):
+		"""Mark entities dirty and make sure a flush is scheduled."""
+		for entity in entities:
+			self.requested += 1
+			self._batch_requested += 1
+			self._dirty[entity] = None
+		if self._handle is None and self._dirty:
+			self._handle = self.hass.loop.call_soon(self._flush)
+
+	def cancel(self):
+		"""Forget pending writes and cancel the scheduled flush."""
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+		self._dirty = {}
+		self._origin = None
+		self._batch_requested = 0
+
+	def _flush(self):
+		"""Write the state of every dirty entity once."""
+		self._handle = None
+		dirty, self._dirty = self._dirty, {}
+		requested, self._batch_requested = self._batch_requested, 0
+		written = 0
+		for entity in dirty:
+			self.flushed += 1
+			if entity.platform is None:
+				# Not added to Home Assistant (yet); writing now would make
+				# its platform reject it as a duplicate entity_id
+				continue
+			entity.async_write_ha_state()
+			written += 1
+		origin, self._origin = self._origin, None
+		if self._metrics is not None:
+			self._metrics.record_state_writes(written, requested - len(dirty))
+			if origin is not None and written:
+				self._metrics.receive_to_state_write.record(time.monotonic() - origin)
+		_LOGGER.debug(
+			"Flushed %d state writes (%d requested, %d saved so far)",
+			len(dirty), self.requested, self.saved
+		)
@@ -0,0 +1,132 @@
+"""Test setup for the Computer integration.
+
+The integration's __init__ needs Home Assistant, but most helpers do not.
+Without Home Assistant the package is registered without running its
+__init__, so those helpers can still be imported and tested on their own;
+tests of the whole integration are skipped.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+HAS_HOMEASSISTANT = importlib.util.find_spec("pytest_homeassistant_custom_component") is not None
+
+CUSTOM_COMPONENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "custom_components"))
+
+# Registered before Home Assistant mounts its testing config, which has a
+# custom_components package of its own
+if "custom_components" not in sys.modules:
+	custom_components = types.ModuleType("custom_components")
+	custom_components.__path__ = [CUSTOM_COMPONENTS_DIR]
+	sys.modules["custom_components"] = custom_components
+
+if not HAS_HOMEASSISTANT and "custom_components.computer" not in sys.modules:
+	computer = types.ModuleType("custom_components.computer")
+	computer.__path__ = [os.path.join(CUSTOM_COMPONENTS_DIR, "computer")]
+	sys.modules["custom_components.computer"] = computer
+
+# Data of a computer config entry; the device name is added per entry
+ENTRY_DATA = {
+	"power_on_action": "power_on",
+	"power_off_action": "power_off",
+}
+
+
+def _start_eagerly(loop, coro):
+	"""Run a coroutine up to its first suspension now, like an eager task.
+
+	Recent Home Assistant versions start tasks eagerly, so a coroutine that
+	never suspends has finished before async_create_task returns.
+	"""
+	if sys.version_info >= (3, 12):
+		return asyncio.Task(coro, loop=loop, eager_start=True)
+	future = loop.create_future()
+	try:
+		yielded = coro.send(None)
+	except StopIteration as done:
+		future.set_result(done.value)
+		return future
+	except Exception as err:
+		future.set_exception(err)
+		return future
+
+	async def resume(yielded):
+		while True:
+			if yielded is None:
+				await asyncio.sleep(0)
+			else:
+				await asyncio.wait([yielded])
+			try:
+				yielded = coro.send(None)
+			except StopIteration as done:
+				return done.value
+
+	return loop.create_task(resume(yielded))
+
+
+class FakeHass:
+	"""The parts of HomeAssistant the helpers use."""
+
+	def __init__(self, loop, eager_start=False):
+		"""Initialize the fake."""
+		self.loop = loop
+		self.data = {}
+		self._eager_start = eager_start
+
+	def async_create_task(self, coro):
+		"""Schedule a coroutine on the loop."""
+		if self._eager_start:
+			return _start_eagerly(self.loop, coro)
+		return self.loop.create_task(coro)
+
+
+@pytest.fixture
+def run():
+	"""Run a test coroutine taking a FakeHass on a fresh event loop."""
+	def runner(test, eager_start=False):
+		async def main():
+			return await test(FakeHass(asyncio.get_running_loop(), eager_start))
+		return asyncio.run(main())
+	return runner
+
+
+if HAS_HOMEASSISTANT:
+	@pytest.fixture(autouse=True)
+	def auto_enable_custom_integrations(enable_custom_integrations):
+		"""Let Home Assistant load the integration from custom_components."""
+		yield
+
+	@pytest.fixture
+	def add_computer(hass):
+		"""Return a coroutine function setting up a config entry for a computer."""
+		from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+		async def add(device_name, **options):
+			entry = MockConfigEntry(
+				domain="computer",
+				title=device_name,
+				unique_id=device_name.lower(),
+				data={**ENTRY_DATA, "device_name": device_name},
+				options=options,
+			)
+			entry.add_to_hass(hass)
+			assert await hass.config_entries.async_setup(entry.entry_id)
+			return entry
+
+		return add
+
+	@pytest.fixture
+	def eager_tasks(hass, monkeypatch):
+		"""Start the tasks hass creates eagerly, as recent Home Assistant does."""
+		def async_create_task(target, name=None, eager_start=True):
+			task = _start_eagerly(hass.loop, target)
+			if not task.done():
+				hass._tasks.add(task)
+				task.add_done_callback(hass._tasks.discard)
+			return task
+
+		monkeypatch.setattr(hass, "async_create_task", async_create_task)
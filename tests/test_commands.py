@@ -0,0 +1,22 @@
+"""Tests for command deduplication."""
+import pytest
+
+from custom_components.computer.commands import COMMAND_MUTE, SingleFlight
+from custom_components.computer.metrics import DeviceMetrics
+
+
+@pytest.mark.parametrize("eager_start", [False, True])
+def test_flight_is_registered_before_run_starts(run, eager_start):
+	"""run() sees its own flight, even when it starts straight away."""
+	async def test(hass):
+		flights = SingleFlight(hass, DeviceMetrics(), settle=0)
+		seen = []
+
+		async def apply(mute):
+			seen.append(flights._flights[COMMAND_MUTE].desired)
+
+		assert await flights.async_run(COMMAND_MUTE, True, lambda: apply(True))
+		assert await flights.async_run(COMMAND_MUTE, False, lambda: apply(False))
+		assert seen == [True, False]
+
+	run(test, eager_start=eager_start)
@@ -0,0 +1,58 @@
+"""Tests for the commands a computer sends to HASS.Agent."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from custom_components.computer.const import DOMAIN
+
+
+def _published(mqtt_mock, topic):
+	"""Return the payloads published to a topic."""
+	return [call.args[1] for call in mqtt_mock.async_publish.call_args_list if call.args[0] == topic]
+
+
+@pytest.fixture(params=[False, True], ids=["lazy", "eager"])
+async def computer(request, hass, mqtt_mock, add_computer):
+	"""Set up a computer, with tasks started lazily or eagerly, and yield its main entity."""
+	entry = await add_computer("PC1")
+	await hass.async_block_till_done()
+	if request.param:
+		request.getfixturevalue("eager_tasks")
+	yield hass.data[DOMAIN]["entities"][entry.entry_id]["main"]
+	assert await hass.config_entries.async_unload(entry.entry_id)
+	await hass.async_block_till_done()
+
+
+async def test_toggles_at_once_press_mute_once(hass, mqtt_mock, computer):
+	"""Two mute toggles arriving together press HASS.Agent's mute button once."""
+	mute_topic = computer._ctx.topics.mute
+	await asyncio.gather(computer.async_toggle_mute(), computer.async_toggle_mute())
+	await hass.async_block_till_done()
+
+	assert _published(mqtt_mock, mute_topic) == ["PRESS"]
+	assert computer._muted
+
+
+async def test_toggles_after_the_press_went_out_press_again(hass, mqtt_mock, computer):
+	"""A toggle after the previous press has gone out unmutes again."""
+	mute_topic = computer._ctx.topics.mute
+	await computer.async_toggle_mute()
+	await hass.async_block_till_done()
+	await computer.async_toggle_mute()
+	await hass.async_block_till_done()
+
+	assert _published(mqtt_mock, mute_topic) == ["PRESS", "PRESS"]
+	assert not computer._muted
+
+
+async def test_lock_button_does_not_lock_twice_when_enforce_lock_relocks(hass, mqtt_mock, computer):
+	"""Pressing lock on an unlocked computer sends one lock command."""
+	await computer.set_session_state("unlocked")
+	lock_topic = computer._ctx.topics.lock
+	lock_button = hass.data[DOMAIN]["entities"][computer._entry_id]["lock"]
+	await lock_button.async_press()
+	await hass.async_block_till_done()
+
+	assert _published(mqtt_mock, lock_topic) == ["PRESS"]
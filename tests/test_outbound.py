@@ -0,0 +1,50 @@
+"""Tests for the prioritised outbound publisher."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant.components.mqtt")
+
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.computer import outbound
+from custom_components.computer.outbound import LANE_SECURITY, LANE_STATE, OutboundPublisher
+
+
+async def _settle():
+	"""Let scheduled callbacks and tasks run."""
+	for _ in range(5):
+		await asyncio.sleep(0)
+
+
+@pytest.mark.parametrize("eager_start", [False, True])
+def test_publishing_resumes_after_every_publish_failed(run, monkeypatch, eager_start):
+	"""A drain in which every publish failed straight away does not stop later publishes."""
+	published = []
+	connected = False
+
+	async def async_publish(hass, topic, payload, retain=False):
+		if not connected:
+			raise HomeAssistantError("client is not currently connected")
+		published.append((topic, payload))
+
+	monkeypatch.setattr(outbound.mqtt, "async_publish", async_publish)
+
+	async def test(hass):
+		nonlocal connected
+		publisher = OutboundPublisher(hass)
+		publisher.publish("pc/currentvolume", "29", lane=LANE_STATE)
+		publisher.publish("pc/lock", "PRESS", lane=LANE_SECURITY)
+		await _settle()
+		lanes = publisher.as_diagnostics()
+		assert lanes[LANE_STATE]["failed"] == 1
+		assert lanes[LANE_SECURITY]["failed"] == 1
+		assert published == []
+
+		connected = True
+		publisher.publish("pc/lock", "PRESS", lane=LANE_SECURITY)
+		await _settle()
+		assert published == [("pc/lock", "PRESS")]
+		assert publisher.as_diagnostics()[LANE_SECURITY]["queued"] == 0
+
+	run(test, eager_start=eager_start)
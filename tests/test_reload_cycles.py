@@ -0,0 +1,314 @@
+"""Reloading a computer many times must not leave anything behind.
+
+Every helper a config entry registers with is taken through repeated
+register/unregister cycles, and so is a whole config entry when Home
+Assistant is installed. Afterwards the internal state must be empty again
+and nothing may still reference the per-entry objects.
+"""
+import asyncio
+import gc
+import importlib.util
+import time
+import weakref
+
+import pytest
+
+from custom_components.computer.commands import COMMAND_LOCK, COMMAND_VOLUME, CommandTracker, session_locked, volume_confirmed_by
+from custom_components.computer.inbound import InboundQueues
+from custom_components.computer.metrics import DeviceMetrics
+from custom_components.computer.refresh import RefreshScheduler
+from custom_components.computer.timer_wheel import async_get_timer_wheel
+from custom_components.computer.write_scheduler import StateWriteCoalescer
+
+CYCLES = 100
+
+requires_homeassistant = pytest.mark.skipif(
+	importlib.util.find_spec("pytest_homeassistant_custom_component") is None,
+	reason="Home Assistant is not installed"
+)
+
+
+class _Device:
+	"""Owns the callbacks a computer hands to the shared helpers."""
+
+	def __init__(self):
+		"""Initialize the device."""
+		self.handled = 0
+
+	async def send(self):
+		"""Publish a command."""
+
+	async def handle(self, msg, received):
+		"""Handle an MQTT message."""
+		self.handled += 1
+
+	def timeout(self):
+		"""Handle a timer."""
+
+
+class _Entity:
+	"""An entity the coalescer can write."""
+
+	platform = object()
+
+	def __init__(self):
+		"""Initialize the entity."""
+		self.writes = 0
+
+	def async_write_ha_state(self):
+		"""Count a state write."""
+		self.writes += 1
+
+
+class _Message:
+	"""An MQTT message."""
+
+	def __init__(self, topic, payload, retain=False):
+		"""Initialize the message."""
+		self.topic = topic
+		self.payload = payload
+		self.retain = retain
+
+
+def _assert_released(refs):
+	"""Assert that none of the weakly referenced objects is still alive."""
+	gc.collect()
+	alive = [ref() for ref in refs if ref() is not None]
+	assert not alive
+
+
+async def _settle():
+	"""Let scheduled callbacks and tasks run."""
+	for _ in range(5):
+		await asyncio.sleep(0)
+
+
+def test_refresh_scheduler_reload_cycles(run):
+	"""Tracking and untracking a device leaves no requests or timers behind."""
+	async def test(hass):
+		scheduler = RefreshScheduler(hass, jitter=0)
+		refs = []
+		for cycle in range(CYCLES):
+			device = _Device()
+			refs.append(weakref.ref(device))
+			name = f"PC{cycle}"
+			untrack = scheduler.track(name, device.send)
+			scheduler.request(name, device.send)
+			await _settle()
+			scheduler.seen(name, "volume")
+			# Unloaded while a second request is waiting for its reply
+			scheduler.request(name, device.send)
+			await _settle()
+			untrack()
+			del device, untrack
+
+			assert scheduler._tracked == {}
+			assert scheduler._queued == {}
+			assert scheduler._in_flight == {}
+			assert scheduler._check_handle is None
+		_assert_released(refs)
+
+	run(test)
+
+
+def test_timer_wheel_and_command_tracker_reload_cycles(run):
+	"""Cancelled heartbeats and pending commands leave the timer wheel empty."""
+	async def test(hass):
+		wheel = async_get_timer_wheel(hass)
+		refs = []
+		for cycle in range(CYCLES):
+			device = _Device()
+			metrics = DeviceMetrics()
+			entry_id = f"entry{cycle}"
+			tracker = CommandTracker(hass, metrics, entry_id, f"PC{cycle}")
+			refs.extend(weakref.ref(obj) for obj in (device, metrics, tracker))
+			wheel.schedule(entry_id, 60, device.timeout)
+			tracker.sent(COMMAND_VOLUME, volume_confirmed_by(50), device.send)
+			tracker.sent(COMMAND_LOCK, session_locked)
+			assert len(wheel) == 3
+			await _settle()
+			tracker.cancel()
+			wheel.cancel(entry_id)
+			del device, metrics, tracker
+
+			assert len(wheel) == 0
+			assert not any(wheel._slots)
+			assert wheel._handle is None
+		_assert_released(refs)
+
+	run(test)
+
+
+@pytest.mark.parametrize("handle_first", [True, False])
+def test_inbound_queues_reload_cycles(run, handle_first):
+	"""Forgetting a device drops its queue, with or without messages still queued."""
+	async def test(hass):
+		queues = InboundQueues(hass)
+		refs = []
+		for cycle in range(CYCLES):
+			device = _Device()
+			refs.append(weakref.ref(device))
+			name = f"PC{cycle}"
+			for payload in ("Desktop", "Editor", "Browser"):
+				queues.submit(
+					name, device.handle,
+					_Message(f"homeassistant/sensor/{name}/{name}_activewindow/state", payload),
+					time.monotonic()
+				)
+			if handle_first:
+				await _settle()
+				assert device.handled == 3
+			queues.forget(name)
+			await _settle()
+			del device
+
+			assert queues._queues == {}
+			assert not queues._ready
+			assert queues._scheduled == set()
+			assert queues._workers == 0
+		_assert_released(refs)
+
+	run(test)
+
+
+def test_state_write_coalescer_reload_cycles(run):
+	"""Cancelling the coalescer drops pending writes and its loop callback."""
+	async def test(hass):
+		refs = []
+		for _ in range(CYCLES):
+			metrics = DeviceMetrics()
+			writer = StateWriteCoalescer(hass, metrics)
+			entity = _Entity()
+			refs.extend(weakref.ref(obj) for obj in (metrics, writer, entity))
+			writer.schedule(entity)
+			await _settle()
+			assert entity.writes == 1
+			writer.schedule(entity, entity)
+			writer.cancel()
+			await _settle()
+
+			assert entity.writes == 1
+			assert writer._dirty == {}
+			assert writer._handle is None
+			del metrics, writer, entity
+		_assert_released(refs)
+
+	run(test)
+
+
+def test_mqtt_router_reload_cycles(run, monkeypatch):
+	"""Registering and unregistering devices keeps the subscription count constant."""
+	pytest.importorskip("homeassistant.components.mqtt")
+	from custom_components.computer import mqtt_router
+
+	subscribed = set()
+
+	async def async_subscribe(hass, topic, callback):
+		subscribed.add(topic)
+		return lambda: subscribed.discard(topic)
+
+	monkeypatch.setattr(mqtt_router.mqtt, "async_subscribe", async_subscribe)
+
+	async def test(hass):
+		router = mqtt_router.MqttRouter(hass)
+		refs = []
+		for cycle in range(CYCLES):
+			device = _Device()
+			refs.append(weakref.ref(device))
+			name = f"PC{cycle}"
+			unregister = await router.async_register_device(name, {
+				"activewindow": device.handle,
+				mqtt_router.SUFFIX_AVAILABILITY: device.handle,
+			})
+			assert len(subscribed) == 2
+			await router._message_received(
+				_Message(f"homeassistant/sensor/{name}/{name}_activewindow/state", "Desktop")
+			)
+			await _settle()
+			assert device.handled == 1
+			unregister()
+			del device, unregister
+
+			assert router._routes == {}
+			assert router._subscriptions == {}
+			assert router._pending == {}
+			assert subscribed == set()
+			assert router._inbound._queues == {}
+		_assert_released(refs)
+
+	run(test)
+
+
+def _listeners(hass):
+	"""Return the event bus listener counts.
+
+	Home Assistant's own stores listen for the final write while a delayed
+	save is pending, so that event is left out.
+	"""
+	listeners = hass.bus.async_listeners()
+	listeners.pop("homeassistant_final_write", None)
+	return listeners
+
+
+def _our_timers(hass):
+	"""Return the loop timers still scheduled by the integration."""
+	timers = []
+	for handle in hass.loop._scheduled:
+		callback = getattr(handle._callback, "func", handle._callback)
+		if not handle.cancelled() and getattr(callback, "__module__", "").startswith("custom_components."):
+			timers.append(handle)
+	return timers
+
+
+@requires_homeassistant
+async def test_config_entry_reload_cycles(hass, mqtt_mock, add_computer):
+	"""Setting up and unloading a computer leaves no listeners, timers or data behind."""
+	from pytest_homeassistant_custom_component.common import async_fire_mqtt_message
+
+	from custom_components.computer.const import DOMAIN
+
+	entry = await add_computer("PC1")
+	await hass.async_block_till_done()
+
+	async def use_and_unload():
+		"""Leave messages, commands and a relock in progress, then unload."""
+		entities = hass.data[DOMAIN]["entities"][entry.entry_id]
+		main = entities["main"]
+		refs = [weakref.ref(entity) for entity in entities.values()]
+		async_fire_mqtt_message(hass, "homeassistant/sensor/PC1/PC1_activewindow/state", "Editor")
+		async_fire_mqtt_message(hass, "homeassistant/sensor/PC1/PC1_sessionstate/state", "unlocked")
+		await hass.async_block_till_done()
+		await main.async_toggle_enforce_lock()
+		await main.async_set_volume_level(0.29)
+		await main.async_lock()
+		del entities, main
+		assert await hass.config_entries.async_unload(entry.entry_id)
+		await hass.async_block_till_done()
+		return refs
+
+	refs = await use_and_unload()
+	# Taken after the first cycle, once the integration-wide helpers exist
+	listeners = _listeners(hass)
+	domain_keys = set(hass.data[DOMAIN])
+
+	for _ in range(CYCLES):
+		assert await hass.config_entries.async_setup(entry.entry_id)
+		await hass.async_block_till_done()
+		refs.extend(await use_and_unload())
+
+		domain_data = hass.data[DOMAIN]
+		assert _listeners(hass) == listeners
+		assert set(domain_data) == domain_keys
+		assert entry.entry_id not in domain_data
+		assert domain_data["entities"] == {}
+		assert domain_data["entity_index"] == {}
+		assert domain_data["entity_index_by_entry"] == {}
+		assert "mqtt_entity_index" not in domain_data
+		router = domain_data["router"]
+		assert router._routes == {}
+		assert router._subscriptions == {}
+		assert router._inbound._queues == {}
+		assert domain_data["refresh"]._tracked == {}
+		assert len(domain_data["timer_wheel"]) == 0
+		assert not _our_timers(hass)
+	_assert_released(refs)
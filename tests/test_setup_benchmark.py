@@ -0,0 +1,35 @@
+"""Startup benchmark: time to set up 1, 10 and 100 computers.
+
+Run with `pytest tests/test_setup_benchmark.py -s` to see the timings.
+"""
+import time
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.computer.const import DOMAIN
+
+
+@pytest.mark.parametrize("count", [1, 10, 100])
+async def test_setup_time(hass, mqtt_mock, add_computer, count, capsys):
+	"""Set up `count` computers, report the time taken and check each entity is registered once."""
+	started = time.perf_counter()
+	entries = [await add_computer(f"PC{index}") for index in range(count)]
+	await hass.async_block_till_done()
+	elapsed = time.perf_counter() - started
+
+	with capsys.disabled():
+		print(f"\nSet up {count} computer(s) in {elapsed * 1000:.0f} ms ({elapsed * 1000 / count:.1f} ms each)")
+
+	registry = er.async_get(hass)
+	per_entry = {len(er.async_entries_for_config_entry(registry, entry.entry_id)) for entry in entries}
+	assert len(per_entry) == 1
+	assert len(hass.states.async_entity_ids()) == count * per_entry.pop()
+	assert len(hass.data[DOMAIN]["entities"]) == count
+
+	for entry in entries:
+		assert await hass.config_entries.async_unload(entry.entry_id)
+	await hass.async_block_till_done()